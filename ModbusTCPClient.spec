@@ -6,11 +6,11 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('templates', 'templates'), ('static', 'static')],
-    hiddenimports=['flask', 'flask_cors', 'pymodbus', 'python_dotenv'],
+    hiddenimports=['flask', 'flask_cors', 'pymodbus', 'pymodbus.client', 'pymodbus.exceptions', 'python_dotenv'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter'],
     noarchive=False,
     optimize=0,
 )
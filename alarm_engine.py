@@ -0,0 +1,320 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TAG_CATEGORIES = ('inputs', 'coils', 'registers')
+CONDITION_TYPES = ('threshold', 'bits', 'rate', 'all', 'any')
+
+def parse_tag(tag: str):
+    """Parse a tag reference like 'registers:10' into (category, address)"""
+    category, _, address = str(tag).partition(':')
+    if category not in TAG_CATEGORIES or not address:
+        raise ValueError(f"Invalid tag '{tag}', expected '<inputs|coils|registers>:<address>'")
+    return category, int(address)
+
+class Condition:
+    """A compiled alarm condition and its current state"""
+
+    # State carried over when a reload keeps the same definition
+    STATE_FIELDS = ('raw', 'active', 'acknowledged', 'value', 'changed_at', 'pending', 'last_sample')
+
+    def __init__(self, definition: Dict):
+        self.definition = definition
+        self.id = str(definition['id'])
+        self.type = definition.get('type', 'threshold')
+        if self.type not in CONDITION_TYPES:
+            raise ValueError(f"Alarm '{self.id}' has unknown type '{self.type}'")
+
+        self.message = definition.get('message', self.id)
+        self.on_delay = float(definition.get('on_delay', 0))
+        self.off_delay = float(definition.get('off_delay', 0))
+        self.deadband = float(definition.get('deadband', 0))
+
+        self.tag = None
+        self.children = []
+        if self.type in ('all', 'any'):
+            self.children = [str(child) for child in definition.get('conditions', [])]
+            if not self.children:
+                raise ValueError(f"Alarm '{self.id}' needs a list of conditions")
+        else:
+            self.tag = parse_tag(definition['tag'])
+
+        self.high = definition.get('high')
+        self.low = definition.get('low')
+        if self.type == 'threshold' and self.high is None and self.low is None:
+            raise ValueError(f"Alarm '{self.id}' needs a high or low limit")
+        self.mask = int(definition.get('mask', 0xFFFF))
+        self.expected = int(definition.get('value', self.mask))
+        self.max_rate = float(definition.get('max_rate', 0))
+        if self.type == 'rate' and self.max_rate <= 0:
+            raise ValueError(f"Alarm '{self.id}' needs a positive max_rate")
+
+        # Raw state is the condition result, active is after on/off delays
+        self.raw = False
+        self.active = False
+        self.acknowledged = True
+        self.value = None
+        self.changed_at = None
+        self.pending = None  # (target state, due time)
+        self.generation = 0
+        self.last_sample = None  # (value, timestamp) for rate conditions
+
+    def evaluate_value(self, value, now: float) -> bool:
+        """Evaluate a tag condition for a new value, applying hysteresis"""
+        self.value = value
+        if self.type == 'bits':
+            return (int(value) & self.mask) == self.expected
+
+        if self.type == 'rate':
+            previous = self.last_sample
+            self.last_sample = (value, now)
+            if previous is None or now <= previous[1]:
+                return self.raw
+            rate = abs(value - previous[0]) / (now - previous[1])
+            limit = self.max_rate - self.deadband if self.raw else self.max_rate
+            return rate >= limit
+
+        # Threshold: once raised, only clear after moving back past the deadband
+        band = self.deadband if self.raw else 0
+        if self.high is not None and value >= self.high - band:
+            return True
+        if self.low is not None and value <= self.low + band:
+            return True
+        return False
+
+    def to_dict(self) -> Dict:
+        """Get the condition state for the API"""
+        return {
+            'id': self.id,
+            'type': self.type,
+            'message': self.message,
+            'tag': f"{self.tag[0]}:{self.tag[1]}" if self.tag else None,
+            'conditions': self.children,
+            'value': self.value,
+            'active': self.active,
+            'acknowledged': self.acknowledged,
+            'pending': self.pending[0] if self.pending else None,
+            'changed_at': self.changed_at
+        }
+
+class AlarmEngine:
+    """Evaluates alarm conditions incrementally as tag values change"""
+
+    def __init__(self, alarms_file: str = 'alarms.json'):
+        self.alarms_file = alarms_file
+        self.conditions = {}
+        self.by_tag = {}       # (category, address) -> [Condition]
+        self.parents = {}      # condition id -> [combined Condition]
+        self.values = {}       # (category, address) -> last value
+        self.timers = []       # heap of (due, generation, condition id)
+        self._lock = threading.RLock()
+
+    def load_alarms(self) -> bool:
+        """Load and compile alarm definitions from the JSON file"""
+        try:
+            if not os.path.exists(self.alarms_file):
+                self.compile([])
+                return True
+            with open(self.alarms_file, 'r') as f:
+                definitions = json.load(f)
+            self.compile(definitions)
+            logger.info(f"Loaded {len(self.conditions)} alarm conditions from {self.alarms_file}")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading alarms: {e}")
+            return False
+
+    def compile(self, definitions: List[Dict]):
+        """
+        Compile alarm definitions into a dependency graph keyed by tag
+
+        Args:
+            definitions (list): Alarm definitions as loaded from JSON
+
+        Raises:
+            ValueError: If a definition is invalid or conditions form a cycle
+        """
+        conditions = {}
+        for definition in definitions:
+            condition = Condition(definition)
+            if condition.id in conditions:
+                raise ValueError(f"Duplicate alarm id '{condition.id}'")
+            conditions[condition.id] = condition
+
+        by_tag = {}
+        parents = {}
+        for condition in conditions.values():
+            if condition.tag:
+                by_tag.setdefault(condition.tag, []).append(condition)
+            for child in condition.children:
+                if child not in conditions:
+                    raise ValueError(f"Alarm '{condition.id}' refers to unknown condition '{child}'")
+                parents.setdefault(child, []).append(condition)
+
+        # Reject cycles between combined conditions; order lists children first
+        visiting, done, order = set(), set(), []
+        def visit(condition_id):
+            if condition_id in done:
+                return
+            if condition_id in visiting:
+                raise ValueError(f"Alarm conditions form a cycle through '{condition_id}'")
+            visiting.add(condition_id)
+            for child in conditions[condition_id].children:
+                visit(child)
+            visiting.discard(condition_id)
+            done.add(condition_id)
+            order.append(conditions[condition_id])
+        for condition_id in conditions:
+            visit(condition_id)
+
+        with self._lock:
+            # Keep the state of conditions whose definition did not change
+            kept = set()
+            for condition in conditions.values():
+                previous = self.conditions.get(condition.id)
+                if previous is not None and previous.definition == condition.definition:
+                    for field in Condition.STATE_FIELDS:
+                        setattr(condition, field, getattr(previous, field))
+                    kept.add(condition.id)
+
+            self.conditions = conditions
+            self.by_tag = by_tag
+            self.parents = parents
+            self.timers = [
+                (condition.pending[1], condition.generation, condition.id)
+                for condition in conditions.values() if condition.pending
+            ]
+            heapq.heapify(self.timers)
+
+            # Evaluate new and changed tag conditions against the last known values
+            now = time.time()
+            for tag, value in self.values.items():
+                for condition in self.by_tag.get(tag, []):
+                    if condition.id not in kept:
+                        self._set_raw(condition, condition.evaluate_value(value, now), now)
+
+            # Bring combined conditions in line with their (possibly new) children
+            for condition in order:
+                if condition.children:
+                    states = [conditions[child].active for child in condition.children]
+                    self._set_raw(condition, all(states) if condition.type == 'all' else any(states), now)
+
+    def update(self, category: str, values: Dict, now: Optional[float] = None):
+        """
+        Feed freshly read values; only conditions on changed tags are evaluated
+
+        Args:
+            category (str): 'inputs', 'coils' or 'registers'
+            values (dict): Address to value mapping as returned by ModbusClient
+            now (float): Timestamp of the read (default: current time)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self.by_tag:
+                return
+
+            # Walk whichever side is smaller: the read block or the referenced tags
+            if len(values) <= len(self.by_tag):
+                items = (((category, address), value) for address, value in values.items())
+            else:
+                items = ((tag, values[tag[1]]) for tag in self.by_tag if tag[0] == category and tag[1] in values)
+
+            for tag, value in items:
+                conditions = self.by_tag.get(tag)
+                if not conditions:
+                    continue
+                changed = self.values.get(tag) != value
+                self.values[tag] = value
+                for condition in conditions:
+                    # Rate of change has to see every sample, not only changes
+                    if changed or condition.type == 'rate':
+                        self._set_raw(condition, condition.evaluate_value(value, now), now)
+
+            self._run_timers(now)
+
+    def tick(self, now: Optional[float] = None):
+        """Apply on/off delays that have expired without a new value"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._run_timers(now)
+
+    def _set_raw(self, condition: Condition, raw: bool, now: float):
+        """Record a new raw result and start the on/off delay if needed"""
+        if raw == condition.raw:
+            return
+        condition.raw = raw
+
+        if raw == condition.active:
+            # Went back before the delay expired
+            condition.pending = None
+            condition.generation += 1
+            return
+
+        delay = condition.on_delay if raw else condition.off_delay
+        if delay <= 0:
+            self._set_active(condition, raw, now)
+        else:
+            condition.generation += 1
+            condition.pending = (raw, now + delay)
+            heapq.heappush(self.timers, (now + delay, condition.generation, condition.id))
+
+    def _run_timers(self, now: float):
+        """Fire expired delay timers"""
+        while self.timers and self.timers[0][0] <= now:
+            due, generation, condition_id = heapq.heappop(self.timers)
+            condition = self.conditions.get(condition_id)
+            if condition is None or condition.generation != generation or condition.pending is None:
+                continue
+            self._set_active(condition, condition.pending[0], due)
+
+    def _set_active(self, condition: Condition, active: bool, now: float):
+        """Change the alarm state and propagate to combined conditions"""
+        condition.pending = None
+        if condition.active == active:
+            return
+
+        condition.active = active
+        condition.changed_at = now
+        if active:
+            condition.acknowledged = False
+            logger.warning(f"Alarm raised: {condition.id} - {condition.message}")
+        else:
+            logger.info(f"Alarm cleared: {condition.id}")
+
+        for parent in self.parents.get(condition.id, []):
+            states = [self.conditions[child].active for child in parent.children]
+            raw = all(states) if parent.type == 'all' else any(states)
+            self._set_raw(parent, raw, now)
+
+    def acknowledge(self, condition_id: str = None) -> int:
+        """
+        Acknowledge one alarm, or all alarms when no id is given
+
+        Returns:
+            int: Number of alarms acknowledged
+        """
+        with self._lock:
+            if condition_id is not None and condition_id not in self.conditions:
+                raise KeyError(f"Unknown alarm '{condition_id}'")
+            targets = [self.conditions[condition_id]] if condition_id is not None else self.conditions.values()
+            count = 0
+            for condition in targets:
+                if not condition.acknowledged:
+                    condition.acknowledged = True
+                    count += 1
+            return count
+
+    def get_alarms(self, active_only: bool = False) -> List[Dict]:
+        """Get alarm states, optionally only active or unacknowledged ones"""
+        with self._lock:
+            self._run_timers(time.time())
+            return [
+                condition.to_dict() for condition in self.conditions.values()
+                if not active_only or condition.active or not condition.acknowledged
+            ]
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, render_template, jsonify, request, send_file, Response
 from flask_cors import CORS
 import os
 import logging
@@ -8,6 +8,10 @@ import sys
 from modbus_client import ModbusClient
 from config import Config
 from names_manager import NamesManager
+from alarm_engine import AlarmEngine
+from scanner import Scanner
+from publisher import create_pipeline
+from profiler import tracer, sample_stacks
 
 # Configure logging
 logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
@@ -16,9 +20,65 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+# Opt-in profiling; with it off no request hooks are installed
+tracer.configure(Config.PROFILING_ENABLED, Config.SLOW_REQUEST_MS)
+if Config.PROFILING_ENABLED:
+    # Sampling and reading the stats are not the requests being profiled
+    UNTRACED_ENDPOINTS = {'profile', 'profile_stats', 'slow_requests'}
+    
+    @app.before_request
+    def start_request_trace():
+        if request.endpoint in UNTRACED_ENDPOINTS:
+            return
+        rule = request.url_rule.rule if request.url_rule else request.path
+        tracer.start_trace(f"{request.method} {rule}")
+    
+    @app.teardown_request
+    def end_request_trace(exception=None):
+        tracer.end_trace()
+
 # Initialize Modbus client and names manager
 modbus_client = ModbusClient()
-names_manager = NamesManager()
+# Names are unpickled in a background thread so the server can bind right away
+names_manager = NamesManager(background=True)
+
+# With SHARED_SNAPSHOT, reads are served from the scan engine's shared memory
+# and only writes use the connection made from the web interface. Alarms,
+# publishing and traffic recording then run once per device in the scan
+# engine; every web worker would otherwise repeat them.
+snapshot_reader = None
+alarm_state = None
+alarm_engine = None
+scanner = None
+publish_pipeline = None
+if Config.SHARED_SNAPSHOT:
+    from scan_engine import AlarmState, SnapshotReader
+    snapshot_reader = SnapshotReader(Config.SNAPSHOT_NAME, Config.SNAPSHOT_DEVICE, Config.SNAPSHOT_MAX_AGE)
+    alarm_state = AlarmState(Config.SCAN_STATE_DIR, snapshot_reader.name)
+    logger.info(f"Serving reads from scan engine snapshot {snapshot_reader.name}; "
+                f"connect to the device to enable writes")
+    if Config.TRAFFIC_RECORD_FILE:
+        logger.info("Traffic is recorded by the scan engine, one file per device")
+else:
+    if Config.TRAFFIC_RECORD_FILE:
+        modbus_client.start_recording(Config.TRAFFIC_RECORD_FILE)
+    # Alarms are evaluated on every read, from the web UI or the background scanner
+    alarm_engine = AlarmEngine(Config.ALARMS_FILE)
+    alarm_engine.load_alarms()
+    modbus_client.add_listener(alarm_engine.update)
+    scanner = Scanner(modbus_client, Config.SCAN_INTERVAL)
+    scanner.add_cycle_listener(lambda duration: alarm_engine.tick())
+    # Northbound publishing to the sinks enabled in the configuration
+    publish_pipeline = create_pipeline(Config)
+    modbus_client.add_listener(publish_pipeline.publish)
+
+def read_source():
+    """Get the object that serves reads: the snapshot reader or the client"""
+    return snapshot_reader or modbus_client
+
+def alarm_source():
+    """Get the object that serves alarms: the scan engine's state or the local engine"""
+    return alarm_state or alarm_engine
 
 # Global variable to track server shutdown
 server_shutdown = threading.Event()
@@ -26,6 +86,9 @@ server_shutdown = threading.Event()
 def shutdown_server():
     """Function to gracefully shutdown the server"""
     server_shutdown.set()
+    if publish_pipeline is not None:
+        publish_pipeline.stop()
+    modbus_client.stop_recording()
     os._exit(0)
 
 @app.route('/')
@@ -44,6 +107,8 @@ def connect():
         
         result = modbus_client.connect(host, port, unit_id)
         if result:
+            if Config.SCAN_ENABLED and scanner is not None:
+                scanner.start()
             return jsonify({'status': 'success', 'message': 'Connected successfully'})
         else:
             return jsonify({'status': 'error', 'message': 'Failed to connect'})
@@ -55,6 +120,8 @@ def connect():
 def disconnect():
     """Disconnect from Modbus server"""
     try:
+        if scanner is not None:
+            scanner.stop()
         modbus_client.disconnect()
         return jsonify({'status': 'success', 'message': 'Disconnected successfully'})
     except Exception as e:
@@ -63,18 +130,30 @@ def disconnect():
 
 @app.route('/api/status')
 def status():
-    """Get connection status"""
-    return jsonify({'connected': modbus_client.is_connected()})
+    """Get connection status; reads and writes differ when serving a snapshot"""
+    return jsonify({
+        'connected': read_source().is_connected(),
+        'writable': modbus_client.is_connected()
+    })
+
+def not_writable():
+    """Error response for a write without a device connection"""
+    if snapshot_reader is not None:
+        return jsonify({'status': 'error',
+                        'message': 'Not connected: reads come from the scan engine, connect to the device to write'})
+    return jsonify({'status': 'error', 'message': 'Not connected'})
 
 @app.route('/api/read_inputs')
 def read_inputs():
     """Read discrete inputs"""
     try:
-        if not modbus_client.is_connected():
+        source = read_source()
+        if not source.is_connected():
             return jsonify({'status': 'error', 'message': 'Not connected'})
         
-        inputs = modbus_client.read_discrete_inputs()
-        return jsonify({'status': 'success', 'data': inputs})
+        inputs = source.read_discrete_inputs()
+        with tracer.span('jsonify'):
+            return jsonify({'status': 'success', 'data': inputs})
     except Exception as e:
         logger.error(f"Read inputs error: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
@@ -83,11 +162,13 @@ def read_inputs():
 def read_coils():
     """Read coils"""
     try:
-        if not modbus_client.is_connected():
+        source = read_source()
+        if not source.is_connected():
             return jsonify({'status': 'error', 'message': 'Not connected'})
         
-        coils = modbus_client.read_coils()
-        return jsonify({'status': 'success', 'data': coils})
+        coils = source.read_coils()
+        with tracer.span('jsonify'):
+            return jsonify({'status': 'success', 'data': coils})
     except Exception as e:
         logger.error(f"Read coils error: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
@@ -96,11 +177,13 @@ def read_coils():
 def read_holding_registers():
     """Read holding registers"""
     try:
-        if not modbus_client.is_connected():
+        source = read_source()
+        if not source.is_connected():
             return jsonify({'status': 'error', 'message': 'Not connected'})
         
-        registers = modbus_client.read_holding_registers()
-        return jsonify({'status': 'success', 'data': registers})
+        registers = source.read_holding_registers()
+        with tracer.span('jsonify'):
+            return jsonify({'status': 'success', 'data': registers})
     except Exception as e:
         logger.error(f"Read holding registers error: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
@@ -110,7 +193,7 @@ def write_coil():
     """Write to a coil"""
     try:
         if not modbus_client.is_connected():
-            return jsonify({'status': 'error', 'message': 'Not connected'})
+            return not_writable()
         
         data = request.json
         address = int(data.get('address'))
@@ -130,7 +213,7 @@ def write_register():
     """Write to a holding register"""
     try:
         if not modbus_client.is_connected():
-            return jsonify({'status': 'error', 'message': 'Not connected'})
+            return not_writable()
         
         data = request.json
         address = int(data.get('address'))
@@ -156,6 +239,48 @@ def get_names():
         logger.error(f"Get names error: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/api/query_names')
+def query_names():
+    """Get one page of names filtered by address range, prefix or substring"""
+    try:
+        category = request.args.get('category')
+        if not category or category not in ['inputs', 'coils', 'registers']:
+            return jsonify({'status': 'error', 'message': 'Invalid category'})
+        
+        start = request.args.get('start', type=int)
+        end = request.args.get('end', type=int)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 100, type=int), 1), Config.MAX_NAMES_PAGE_SIZE)
+        
+        result = names_manager.query_names(
+            category,
+            start=start,
+            end=end,
+            prefix=request.args.get('prefix') or None,
+            contains=request.args.get('contains') or None,
+            offset=offset,
+            limit=limit
+        )
+        return jsonify({'status': 'success', 'data': result})
+    except Exception as e:
+        logger.error(f"Query names error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/api/find_name')
+def find_name():
+    """Find the addresses that use an exact name"""
+    try:
+        name = request.args.get('name')
+        if not name:
+            return jsonify({'status': 'error', 'message': 'No name given'})
+        
+        category = request.args.get('category') or None
+        matches = names_manager.find_address(name, category)
+        return jsonify({'status': 'success', 'data': matches})
+    except Exception as e:
+        logger.error(f"Find name error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.route('/api/set_name', methods=['POST'])
 def set_name():
     """Set name for a specific address"""
@@ -196,8 +321,8 @@ def load_names():
     try:
         result = names_manager.load_names()
         if result:
-            names = names_manager.get_all_names()
-            return jsonify({'status': 'success', 'message': 'Names loaded successfully', 'data': names})
+            counts = names_manager.get_counts()
+            return jsonify({'status': 'success', 'message': 'Names loaded successfully', 'counts': counts})
         else:
             return jsonify({'status': 'error', 'message': 'Failed to load names'})
     except Exception as e:
@@ -210,8 +335,8 @@ def reset_names():
     try:
         result = names_manager.reset_to_defaults()
         if result:
-            names = names_manager.get_all_names()
-            return jsonify({'status': 'success', 'message': 'Names reset to defaults', 'data': names})
+            counts = names_manager.get_counts()
+            return jsonify({'status': 'success', 'message': 'Names reset to defaults', 'counts': counts})
         else:
             return jsonify({'status': 'error', 'message': 'Failed to reset names'})
     except Exception as e:
@@ -256,8 +381,8 @@ def import_names():
                 os.remove(temp_filename)
             
             if result:
-                names = names_manager.get_all_names()
-                return jsonify({'status': 'success', 'message': 'Names imported successfully', 'data': names})
+                counts = names_manager.get_counts()
+                return jsonify({'status': 'success', 'message': 'Names imported successfully', 'counts': counts})
             else:
                 return jsonify({'status': 'error', 'message': 'Failed to import names'})
         else:
@@ -266,6 +391,103 @@ def import_names():
         logger.error(f"Import names error: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
 
+# Alarm API endpoints
+@app.route('/api/get_alarms')
+def get_alarms():
+    """Get alarm states, only active or unacknowledged ones with ?active=true"""
+    try:
+        active_only = request.args.get('active', 'false').lower() == 'true'
+        alarms = alarm_source().get_alarms(active_only)
+        return jsonify({'status': 'success', 'data': alarms})
+    except Exception as e:
+        logger.error(f"Get alarms error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/api/acknowledge_alarm', methods=['POST'])
+def acknowledge_alarm():
+    """Acknowledge one alarm by id, or all alarms when no id is given"""
+    try:
+        # A bare POST without a JSON body acknowledges all alarms
+        data = request.get_json(silent=True) or {}
+        count = alarm_source().acknowledge(data.get('id'))
+        return jsonify({'status': 'success', 'message': f'{count} alarm(s) acknowledged'})
+    except KeyError as e:
+        return jsonify({'status': 'error', 'message': str(e.args[0])})
+    except Exception as e:
+        logger.error(f"Acknowledge alarm error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/api/reload_alarms', methods=['POST'])
+def reload_alarms():
+    """Reload alarm definitions from file"""
+    try:
+        if alarm_state is not None:
+            # The scan engine owns the alarm engines and reloads on its next cycle
+            alarm_state.request_reload()
+            return jsonify({'status': 'success', 'message': 'Reload requested from the scan engine'})
+        result = alarm_engine.load_alarms()
+        if result:
+            return jsonify({'status': 'success', 'message': f'{len(alarm_engine.conditions)} alarm(s) loaded'})
+        else:
+            return jsonify({'status': 'error', 'message': 'Failed to load alarms'})
+    except Exception as e:
+        logger.error(f"Reload alarms error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/api/publish_metrics')
+def publish_metrics():
+    """Get queue and throughput metrics for each publishing sink"""
+    try:
+        if publish_pipeline is None:
+            return jsonify({'status': 'error', 'message': 'Publishing runs in the scan engine'})
+        return jsonify({'status': 'success', 'data': publish_pipeline.get_metrics()})
+    except Exception as e:
+        logger.error(f"Publish metrics error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+# Profiling API endpoints
+@app.route('/api/profile')
+def profile():
+    """Sample all threads for N seconds and return folded stacks for a flamegraph"""
+    try:
+        if not Config.PROFILING_ENABLED:
+            return jsonify({'status': 'error', 'message': 'Profiling is disabled'})
+        
+        seconds = min(max(request.args.get('seconds', 5, type=float), 0.1), Config.PROFILE_MAX_SECONDS)
+        interval = max(request.args.get('interval', 0.005, type=float), 0.001)
+        folded = sample_stacks(seconds, interval)
+        return Response(folded, mimetype='text/plain',
+                        headers={'Content-Disposition': 'attachment; filename=profile.folded'})
+    except Exception as e:
+        logger.error(f"Profile error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/api/profile_stats')
+def profile_stats():
+    """Get per-stage timings of API requests and scan cycles"""
+    try:
+        if not Config.PROFILING_ENABLED:
+            return jsonify({'status': 'error', 'message': 'Profiling is disabled'})
+        
+        if request.args.get('reset', 'false').lower() == 'true':
+            tracer.reset()
+        return jsonify({'status': 'success', 'data': tracer.get_stats()})
+    except Exception as e:
+        logger.error(f"Profile stats error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/api/slow_requests')
+def slow_requests():
+    """Get recent requests and scan cycles slower than SLOW_REQUEST_MS"""
+    try:
+        if not Config.PROFILING_ENABLED:
+            return jsonify({'status': 'error', 'message': 'Profiling is disabled'})
+        
+        return jsonify({'status': 'success', 'data': tracer.get_slow()})
+    except Exception as e:
+        logger.error(f"Slow requests error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.route('/api/shutdown', methods=['POST'])
 def shutdown():
     """Shutdown the server"""
@@ -279,4 +501,4 @@ def shutdown():
         return jsonify({'status': 'error', 'message': str(e)})
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=Config.DEBUG, host='0.0.0.0', port=Config.FLASK_PORT)
@@ -10,6 +10,7 @@ class Config:
     # Flask Configuration
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
+    FLASK_PORT = int(os.environ.get('FLASK_PORT', '5000'))
     
     # Modbus Default Configuration
     DEFAULT_MODBUS_HOST = os.environ.get('MODBUS_HOST', 'localhost')
@@ -27,6 +28,45 @@ class Config:
     # Auto Refresh Settings
     DEFAULT_REFRESH_INTERVAL = 5000  # 5 seconds
     
+    # Background Scan Settings
+    SCAN_ENABLED = os.environ.get('SCAN_ENABLED', 'False').lower() == 'true'
+    SCAN_INTERVAL = float(os.environ.get('SCAN_INTERVAL', '1.0'))  # seconds
+    
+    # Scan Engine Settings (see scan_engine.py)
+    SCAN_DEVICES = os.environ.get('SCAN_DEVICES', f"{DEFAULT_MODBUS_HOST}:{DEFAULT_MODBUS_PORT}:{DEFAULT_MODBUS_UNIT_ID}")
+    SCAN_PROCESSES = int(os.environ.get('SCAN_PROCESSES', '0'))  # 0 = one per device, up to CPU count
+    SNAPSHOT_NAME = os.environ.get('SNAPSHOT_NAME', 'pymodbusflask')
+    SHARED_SNAPSHOT = os.environ.get('SHARED_SNAPSHOT', 'False').lower() == 'true'
+    SNAPSHOT_DEVICE = int(os.environ.get('SNAPSHOT_DEVICE', '0'))
+    SNAPSHOT_MAX_AGE = float(os.environ.get('SNAPSHOT_MAX_AGE', '10'))  # seconds
+    SCAN_STATE_DIR = os.environ.get('SCAN_STATE_DIR', 'scan_state')  # alarm state shared with web workers
+    
+    # Alarm Settings
+    ALARMS_FILE = os.environ.get('ALARMS_FILE', 'alarms.json')
+    
+    # Publishing Settings (a sink is enabled by setting its target)
+    PUBLISH_MQTT_HOST = os.environ.get('PUBLISH_MQTT_HOST', '')
+    PUBLISH_MQTT_PORT = int(os.environ.get('PUBLISH_MQTT_PORT', '1883'))
+    PUBLISH_MQTT_TOPIC = os.environ.get('PUBLISH_MQTT_TOPIC', 'modbus')
+    PUBLISH_LINE_TARGET = os.environ.get('PUBLISH_LINE_TARGET', '')  # file path, tcp://host:port or udp://host:port
+    PUBLISH_WEBHOOK_URL = os.environ.get('PUBLISH_WEBHOOK_URL', '')
+    PUBLISH_BATCH_SIZE = int(os.environ.get('PUBLISH_BATCH_SIZE', '100'))
+    PUBLISH_BATCH_INTERVAL = float(os.environ.get('PUBLISH_BATCH_INTERVAL', '1.0'))  # seconds
+    PUBLISH_QUEUE_SIZE = int(os.environ.get('PUBLISH_QUEUE_SIZE', '10000'))
+    PUBLISH_SPOOL_DIR = os.environ.get('PUBLISH_SPOOL_DIR', 'spool')
+    PUBLISH_ON_CHANGE = os.environ.get('PUBLISH_ON_CHANGE', 'True').lower() == 'true'
+    
+    # Traffic Recording (binary log of every transaction, replay with replay.py)
+    TRAFFIC_RECORD_FILE = os.environ.get('TRAFFIC_RECORD_FILE', '')
+    
+    # Names Lookup Settings
+    MAX_NAMES_PAGE_SIZE = int(os.environ.get('MAX_NAMES_PAGE_SIZE', '500'))
+    
+    # Profiling Settings
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False').lower() == 'true'
+    SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+    PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', '60'))
+    
     # Logging Configuration
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     
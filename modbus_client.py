@@ -1,9 +1,31 @@
-from pymodbus.client import ModbusTcpClient
-from pymodbus.exceptions import ModbusException
 import logging
+import threading
+import time
+import traffic_recorder
+from profiler import tracer
 
 logger = logging.getLogger(__name__)
 
+_pymodbus = None
+
+def load_pymodbus():
+    """
+    Import pymodbus on first use, keeping it out of application startup
+    
+    Returns:
+        tuple: (ModbusTcpClient, ModbusException)
+    """
+    global _pymodbus
+    if _pymodbus is None:
+        from pymodbus.client import ModbusTcpClient
+        from pymodbus.exceptions import ModbusException
+        _pymodbus = (ModbusTcpClient, ModbusException)
+    return _pymodbus
+
+def modbus_error(message):
+    """Create a pymodbus ModbusException"""
+    return load_pymodbus()[1](message)
+
 class ModbusClient:
     def __init__(self):
         self.client = None
@@ -19,6 +41,108 @@ class ModbusClient:
         self.coil_count = 16
         self.register_start = 0
         self.register_count = 16
+        
+        # Serialises requests from web requests and the background scanner
+        self.lock = threading.RLock()
+        self.listeners = []
+        
+        # Optional TrafficRecorder logging every transaction
+        self.recorder = None
+    
+    def add_listener(self, callback):
+        """
+        Register a callback for successful reads
+        
+        Args:
+            callback (callable): Called as callback(category, values) where
+                category is 'inputs', 'coils' or 'registers'
+        """
+        self.listeners.append(callback)
+    
+    def _notify(self, category, values):
+        """Pass freshly read values to all listeners"""
+        with tracer.span('listeners'):
+            for callback in self.listeners:
+                try:
+                    callback(category, values)
+                except Exception as e:
+                    logger.error(f"Read listener error: {e}")
+    
+    def start_recording(self, filename):
+        """
+        Start logging every transaction to a binary traffic log
+        
+        Args:
+            filename (str): Log file, appended to if it exists
+        """
+        self.stop_recording()
+        self.recorder = traffic_recorder.TrafficRecorder(filename)
+        logger.info(f"Recording Modbus traffic to {filename}")
+    
+    def stop_recording(self):
+        """Stop logging transactions"""
+        recorder = self.recorder
+        self.recorder = None
+        if recorder:
+            recorder.close()
+            logger.info(f"Recorded {recorder.count} transactions to {recorder.filename}")
+    
+    def _execute(self, function_code, address, count, request, *args, written=None):
+        """
+        Send a request, recording it when a recorder is active
+        
+        Args:
+            function_code (int): Modbus function code of the request
+            address (int): Starting address
+            count (int): Number of items requested
+            request (callable): pymodbus client method to call
+            *args: Positional arguments for the request
+            written: Value written, recorded for write requests
+        
+        Returns:
+            The pymodbus response
+        """
+        recorder = self.recorder
+        if recorder is None:
+            with self.lock, tracer.span('modbus.request'):
+                return request(*args, unit=self.unit_id)
+        
+        timestamp = time.time()
+        started = time.perf_counter()
+        try:
+            with self.lock, tracer.span('modbus.request'):
+                result = request(*args, unit=self.unit_id)
+        except Exception:
+            self._record(recorder, timestamp, function_code, address, count,
+                         time.perf_counter() - started, None)
+            raise
+        latency = time.perf_counter() - started
+        
+        self._record(recorder, timestamp, function_code, address, count, latency, result, written)
+        return result
+    
+    def _record(self, recorder, timestamp, function_code, address, count, latency, result, written=None):
+        """Log a transaction, turning recording off if the recorder fails"""
+        try:
+            ok = result is not None and not result.isError()
+            values = None
+            if ok:
+                if written is not None:
+                    values = [written]
+                elif function_code in (traffic_recorder.READ_COILS, traffic_recorder.READ_DISCRETE_INPUTS):
+                    values = result.bits[:count]
+                else:
+                    values = result.registers
+            recorder.record(timestamp, function_code, self.unit_id, address, count, latency, ok, values)
+        except Exception as e:
+            # A full disk or closed log must not fail a request that succeeded
+            logger.error(f"Traffic recording failed, recording stopped: {e}")
+            if self.recorder is recorder:
+                self.recorder = None
+            try:
+                recorder.close()
+            except Exception:
+                pass
     
     def connect(self, host='localhost', port=502, unit_id=1):
         """
@@ -36,6 +160,7 @@ class ModbusClient:
             if self.connected:
                 self.disconnect()
             
+            ModbusTcpClient, _ = load_pymodbus()
             self.client = ModbusTcpClient(host, port)
             self.host = host
             self.port = port
@@ -57,10 +182,11 @@ class ModbusClient:
     def disconnect(self):
         """Disconnect from Modbus server"""
         try:
-            if self.client:
-                self.client.close()
-                self.client = None
-            self.connected = False
+            with self.lock:
+                if self.client:
+                    self.client.close()
+                    self.client = None
+                self.connected = False
             logger.info("Disconnected from Modbus server")
         except Exception as e:
             logger.error(f"Disconnection error: {e}")
@@ -87,14 +213,17 @@ class ModbusClient:
         count = count if count is not None else self.input_count
         
         try:
-            result = self.client.read_discrete_inputs(start, count, unit=self.unit_id)
+            result = self._execute(traffic_recorder.READ_DISCRETE_INPUTS, start, count,
+                                   self.client.read_discrete_inputs, start, count)
             if result.isError():
-                raise ModbusException(f"Error reading discrete inputs: {result}")
+                raise modbus_error(f"Error reading discrete inputs: {result}")
             
-            inputs = {}
-            for i, value in enumerate(result.bits):
-                inputs[start + i] = bool(value)
+            with tracer.span('modbus.decode'):
+                inputs = {}
+                for i, value in enumerate(result.bits):
+                    inputs[start + i] = bool(value)
             
+            self._notify('inputs', inputs)
             return inputs
             
         except Exception as e:
@@ -119,14 +248,17 @@ class ModbusClient:
         count = count if count is not None else self.coil_count
         
         try:
-            result = self.client.read_coils(start, count, unit=self.unit_id)
+            result = self._execute(traffic_recorder.READ_COILS, start, count,
+                                   self.client.read_coils, start, count)
             if result.isError():
-                raise ModbusException(f"Error reading coils: {result}")
+                raise modbus_error(f"Error reading coils: {result}")
             
-            coils = {}
-            for i, value in enumerate(result.bits):
-                coils[start + i] = bool(value)
+            with tracer.span('modbus.decode'):
+                coils = {}
+                for i, value in enumerate(result.bits):
+                    coils[start + i] = bool(value)
             
+            self._notify('coils', coils)
             return coils
             
         except Exception as e:
@@ -151,14 +283,17 @@ class ModbusClient:
         count = count if count is not None else self.register_count
         
         try:
-            result = self.client.read_holding_registers(start, count, unit=self.unit_id)
+            result = self._execute(traffic_recorder.READ_HOLDING_REGISTERS, start, count,
+                                   self.client.read_holding_registers, start, count)
             if result.isError():
-                raise ModbusException(f"Error reading holding registers: {result}")
+                raise modbus_error(f"Error reading holding registers: {result}")
             
-            registers = {}
-            for i, value in enumerate(result.registers):
-                registers[start + i] = value
+            with tracer.span('modbus.decode'):
+                registers = {}
+                for i, value in enumerate(result.registers):
+                    registers[start + i] = value
             
+            self._notify('registers', registers)
             return registers
             
         except Exception as e:
@@ -180,7 +315,8 @@ class ModbusClient:
             raise Exception("Not connected to Modbus server")
         
         try:
-            result = self.client.write_coil(address, value, unit=self.unit_id)
+            result = self._execute(traffic_recorder.WRITE_COIL, address, 1,
+                                   self.client.write_coil, address, value, written=value)
             if result.isError():
                 logger.error(f"Error writing coil {address}: {result}")
                 return False
@@ -207,7 +343,8 @@ class ModbusClient:
             raise Exception("Not connected to Modbus server")
         
         try:
-            result = self.client.write_register(address, value, unit=self.unit_id)
+            result = self._execute(traffic_recorder.WRITE_REGISTER, address, 1,
+                                   self.client.write_register, address, value, written=value)
             if result.isError():
                 logger.error(f"Error writing register {address}: {result}")
                 return False
@@ -23,16 +23,11 @@ a = Analysis(
         'itsdangerous',
         'click',
         'blinker',
-        'certifi',
-        'charset_normalizer',
-        'idna',
-        'requests',
-        'urllib3',
     ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -1,26 +1,177 @@
 import os
 import pickle
 import json
-from typing import Dict, Optional
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional
+
+CATEGORIES = ('inputs', 'coils', 'registers')
+
+class NameIndex:
+    """Search indexes over the names of one category
+    
+    Keeps addresses sorted for range queries, a sorted list of lower-cased
+    names for prefix queries, a trigram map for substring queries and a
+    reverse name -> addresses map for lookups by name.
+    """
+    
+    def __init__(self, entries: Dict = None):
+        self.by_name = {}
+        self.trigrams = {}
+        self.names = {address: str(name) for address, name in (entries or {}).items()}
+
+        # Bulk build with one sort per list instead of repeated insort
+        self.addresses = sorted(self.names)
+        self.sorted_names = sorted((name.lower(), address) for address, name in self.names.items())
+        for address, name in self.names.items():
+            self.by_name.setdefault(name, []).append(address)
+            for gram in self._grams(name.lower()):
+                self.trigrams.setdefault(gram, set()).add(address)
+    
+    @staticmethod
+    def _grams(text: str):
+        """Get the set of trigrams of a lower-cased name"""
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    
+    def add(self, address: int, name: str):
+        """Index a name, replacing any previous name for the address"""
+        if address in self.names:
+            self.remove(address)
+        else:
+            insort(self.addresses, address)
+        
+        name = str(name)
+        lowered = name.lower()
+        self.names[address] = name
+        insort(self.sorted_names, (lowered, address))
+        self.by_name.setdefault(name, []).append(address)
+        for gram in self._grams(lowered):
+            self.trigrams.setdefault(gram, set()).add(address)
+    
+    def remove(self, address: int, keep_address: bool = True):
+        """Drop the name indexed for an address"""
+        name = self.names.pop(address, None)
+        if name is None:
+            return
+        
+        lowered = name.lower()
+        position = bisect_left(self.sorted_names, (lowered, address))
+        if position < len(self.sorted_names) and self.sorted_names[position] == (lowered, address):
+            del self.sorted_names[position]
+        
+        addresses = self.by_name.get(name, [])
+        if address in addresses:
+            addresses.remove(address)
+        if not addresses:
+            self.by_name.pop(name, None)
+        
+        for gram in self._grams(lowered):
+            members = self.trigrams.get(gram)
+            if members is not None:
+                members.discard(address)
+                if not members:
+                    del self.trigrams[gram]
+        
+        if not keep_address:
+            position = bisect_left(self.addresses, address)
+            if position < len(self.addresses) and self.addresses[position] == address:
+                del self.addresses[position]
+    
+    def address_range(self, start: Optional[int] = None, end: Optional[int] = None) -> List[int]:
+        """Get the sorted addresses between start and end (inclusive)"""
+        low = 0 if start is None else bisect_left(self.addresses, start)
+        high = len(self.addresses) if end is None else bisect_right(self.addresses, end)
+        return self.addresses[low:high]
+    
+    def with_prefix(self, prefix: str) -> List[int]:
+        """Get the addresses whose name starts with prefix (case-insensitive)"""
+        prefix = prefix.lower()
+        addresses = []
+        for position in range(bisect_left(self.sorted_names, (prefix,)), len(self.sorted_names)):
+            name, address = self.sorted_names[position]
+            if not name.startswith(prefix):
+                break
+            addresses.append(address)
+        return sorted(addresses)
+    
+    def containing(self, text: str) -> List[int]:
+        """Get the addresses whose name contains text (case-insensitive)"""
+        text = text.lower()
+        if len(text) < 3:
+            candidates = self.names.keys()
+        else:
+            candidates = None
+            for gram in sorted(self._grams(text), key=lambda g: len(self.trigrams.get(g, ()))):
+                members = self.trigrams.get(gram)
+                if not members:
+                    return []
+                candidates = set(members) if candidates is None else candidates & members
+                if not candidates:
+                    return []
+        return sorted(address for address in candidates if text in self.names[address].lower())
 
 class NamesManager:
     """Manages custom names for Modbus addresses"""
     
-    def __init__(self, names_file='modbus_names.bin'):
+    def __init__(self, names_file='modbus_names.bin', background=False):
         self.names_file = names_file
         self.names = {
             'inputs': {},
             'coils': {},
             'registers': {}
         }
-        self.load_names()
+        self.indexes = {}
+        self._lock = threading.RLock()
+        self._loaded = threading.Event()
+        if background:
+            threading.Thread(target=self._initial_load, name='names-loader', daemon=True).start()
+        else:
+            self._initial_load()
+    
+    def _initial_load(self):
+        """Load names at startup and release callers waiting for them"""
+        try:
+            self._load_file()
+        finally:
+            self._loaded.set()
+    
+    def wait_until_loaded(self, timeout: float = None) -> bool:
+        """Block until the initial load has finished"""
+        return self._loaded.wait(timeout)
+    
+    def _replace_names(self, names: Dict):
+        """Swap in a new names map and rebuild all search indexes
+        
+        Address keys are normalised to ints into a copy first, so a bad
+        key raises before the current names or indexes are touched.
+        """
+        normalised = {
+            category: {int(address): name for address, name in entries.items()}
+            for category, entries in names.items()
+        }
+        indexes = {category: NameIndex(entries) for category, entries in normalised.items()}
+        with self._lock:
+            self.names = normalised
+            self.indexes = indexes
+    
+    def _index(self, category: str) -> NameIndex:
+        """Get the index for a category, creating it if needed"""
+        if category not in self.indexes:
+            self.indexes[category] = NameIndex(self.names.get(category, {}))
+        return self.indexes[category]
     
     def load_names(self) -> bool:
         """Load names from binary file"""
+        # Don't race the background load started by the constructor
+        self.wait_until_loaded()
+        return self._load_file()
+    
+    def _load_file(self) -> bool:
+        """Read the names file, falling back to defaults"""
         try:
             if os.path.exists(self.names_file):
                 with open(self.names_file, 'rb') as f:
-                    self.names = pickle.load(f)
+                    self._replace_names(pickle.load(f))
                 return True
             else:
                 # Initialize with default names if file doesn't exist
@@ -33,6 +184,7 @@ class NamesManager:
     
     def save_names(self) -> bool:
         """Save names to binary file"""
+        self.wait_until_loaded()
         try:
             with open(self.names_file, 'wb') as f:
                 pickle.dump(self.names, f)
@@ -43,35 +195,103 @@ class NamesManager:
     
     def initialize_default_names(self):
         """Initialize with default names"""
-        self.names = {
+        self._replace_names({
             'inputs': {i: f"Input_{i}" for i in range(16)},
             'coils': {i: f"Coil_{i}" for i in range(16)},
             'registers': {i: f"Register_{i}" for i in range(16)}
-        }
+        })
     
     def get_name(self, category: str, address: int) -> str:
         """Get name for a specific address"""
+        self.wait_until_loaded()
         return self.names.get(category, {}).get(address, f"{category.title()}_{address}")
     
     def set_name(self, category: str, address: int, name: str) -> bool:
         """Set name for a specific address"""
-        if category not in self.names:
-            self.names[category] = {}
-        
-        self.names[category][address] = name
+        self.wait_until_loaded()
+        with self._lock:
+            if category not in self.names:
+                self.names[category] = {}
+            
+            self.names[category][address] = name
+            self._index(category).add(address, name)
         return self.save_names()
     
     def get_all_names(self) -> Dict:
         """Get all names"""
-        return self.names.copy()
+        self.wait_until_loaded()
+        with self._lock:
+            return {category: dict(entries) for category, entries in self.names.items()}
     
     def set_all_names(self, names: Dict) -> bool:
         """Set all names at once"""
-        self.names = names.copy()
+        self.wait_until_loaded()
+        self._replace_names(names)
         return self.save_names()
     
+    def get_counts(self) -> Dict:
+        """Get the number of named addresses per category"""
+        self.wait_until_loaded()
+        return {category: len(entries) for category, entries in self.names.items()}
+    
+    def query_names(self, category: str, start: int = None, end: int = None,
+                    prefix: str = None, contains: str = None,
+                    offset: int = 0, limit: int = 100) -> Dict:
+        """
+        Query one page of names using the search indexes
+        
+        Args:
+            category (str): 'inputs', 'coils' or 'registers'
+            start (int): Lowest address to include
+            end (int): Highest address to include
+            prefix (str): Only names starting with this text
+            contains (str): Only names containing this text
+            offset (int): Number of matches to skip
+            limit (int): Maximum number of matches to return
+        
+        Returns:
+            dict: Total match count and the requested page of items
+        """
+        self.wait_until_loaded()
+        with self._lock:
+            index = self._index(category)
+            if prefix:
+                addresses = index.with_prefix(prefix)
+            elif contains:
+                addresses = index.containing(contains)
+            else:
+                addresses = index.address_range(start, end)
+            
+            if prefix and contains:
+                contains = contains.lower()
+                addresses = [a for a in addresses if contains in index.names[a].lower()]
+            if (prefix or contains) and (start is not None or end is not None):
+                low = start if start is not None else float('-inf')
+                high = end if end is not None else float('inf')
+                addresses = [a for a in addresses if low <= a <= high]
+            
+            page = addresses[offset:offset + limit]
+            return {
+                'total': len(addresses),
+                'offset': offset,
+                'limit': limit,
+                'items': [{'address': a, 'name': index.names.get(a, self.get_name(category, a))} for a in page]
+            }
+    
+    def find_address(self, name: str, category: str = None) -> List[Dict]:
+        """Find the addresses using an exact name"""
+        self.wait_until_loaded()
+        categories = [category] if category else list(self.names)
+        with self._lock:
+            return [
+                {'category': c, 'address': address}
+                for c in categories
+                for address in sorted(self._index(c).by_name.get(name, []))
+            ]
+    
     def export_to_json(self, filename: str = 'modbus_names.json') -> bool:
         """Export names to JSON file"""
+        self.wait_until_loaded()
         try:
             with open(filename, 'w') as f:
                 json.dump(self.names, f, indent=2)
@@ -82,13 +302,14 @@ class NamesManager:
     
     def import_from_json(self, filename: str) -> bool:
         """Import names from JSON file"""
+        self.wait_until_loaded()
         try:
             with open(filename, 'r') as f:
                 imported_names = json.load(f)
             
             # Validate structure
-            if all(key in imported_names for key in ['inputs', 'coils', 'registers']):
-                self.names = imported_names
+            if all(key in imported_names for key in CATEGORIES):
+                self._replace_names(imported_names)
                 return self.save_names()
             else:
                 print("Invalid JSON structure")
@@ -99,23 +320,30 @@ class NamesManager:
     
     def reset_to_defaults(self) -> bool:
         """Reset all names to defaults"""
+        self.wait_until_loaded()
         self.initialize_default_names()
         return self.save_names()
     
     def add_address(self, category: str, address: int, name: str = None) -> bool:
         """Add a new address with optional name"""
+        self.wait_until_loaded()
         if name is None:
             name = f"{category.title()}_{address}"
         
-        if category not in self.names:
-            self.names[category] = {}
-        
-        self.names[category][address] = name
+        with self._lock:
+            if category not in self.names:
+                self.names[category] = {}
+            
+            self.names[category][address] = name
+            self._index(category).add(address, name)
         return self.save_names()
     
     def remove_address(self, category: str, address: int) -> bool:
         """Remove an address"""
-        if category in self.names and address in self.names[category]:
-            del self.names[category][address]
-            return self.save_names()
+        self.wait_until_loaded()
+        with self._lock:
+            if category in self.names and address in self.names[category]:
+                del self.names[category][address]
+                self._index(category).remove(address, keep_address=False)
+                return self.save_names()
         return False
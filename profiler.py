@@ -0,0 +1,177 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+class _NullSpan:
+    """Span used when tracing is off; entering and leaving it does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """Times one stage of the current trace"""
+
+    __slots__ = ('trace', 'name', 'started')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stages = self.trace['stages']
+        stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+class Tracer:
+    """Per-stage timing of API requests and scan cycles
+
+    A trace is started per request or scan cycle on the current thread;
+    code on the hot path wraps its stages in span(). When tracing is
+    disabled span() returns a shared no-op object.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_threshold = 0.5
+        self.slow = deque(maxlen=100)
+        self.stats = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, slow_threshold_ms: float = 500, max_slow: int = 100):
+        """
+        Turn tracing on or off
+
+        Args:
+            enabled (bool): Record spans and traces
+            slow_threshold_ms (float): Traces slower than this are logged
+            max_slow (int): Number of slow traces kept for the API
+        """
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold_ms / 1000.0
+        self.slow = deque(self.slow, maxlen=max_slow)
+
+    def span(self, name: str):
+        """Time a stage of the current trace"""
+        if not self.enabled:
+            return _NULL_SPAN
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return _NULL_SPAN
+        return _Span(trace, name)
+
+    def start_trace(self, name: str):
+        """Start a trace on the current thread"""
+        if self.enabled:
+            self._local.trace = {'name': name, 'started': time.perf_counter(), 'stages': {}}
+
+    def end_trace(self):
+        """Finish the current trace, update statistics and log it if slow"""
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return None
+        self._local.trace = None
+
+        total = time.perf_counter() - trace['started']
+        stages = trace['stages']
+        stages['other'] = max(total - sum(stages.values()), 0.0)
+
+        with self._lock:
+            stats = self.stats.setdefault(trace['name'], {})
+            for stage, seconds in list(stages.items()) + [('total', total)]:
+                entry = stats.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+        if total >= self.slow_threshold:
+            breakdown = ', '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in stages.items())
+            logger.warning(f"Slow {trace['name']}: {total * 1000:.1f}ms ({breakdown})")
+            self.slow.append({
+                'name': trace['name'],
+                'timestamp': time.time(),
+                'total_ms': round(total * 1000, 3),
+                'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in stages.items()}
+            })
+        return trace
+
+    def get_stats(self) -> Dict:
+        """Get count, mean and max milliseconds per stage for each trace name"""
+        with self._lock:
+            return {
+                name: {
+                    stage: {
+                        'count': count,
+                        'mean_ms': round(total / count * 1000, 3),
+                        'max_ms': round(maximum * 1000, 3)
+                    }
+                    for stage, (count, total, maximum) in stages.items()
+                }
+                for name, stages in self.stats.items()
+            }
+
+    def get_slow(self) -> List[Dict]:
+        """Get the most recent slow traces"""
+        return list(self.slow)
+
+    def reset(self):
+        """Clear collected statistics and slow traces"""
+        with self._lock:
+            self.stats = {}
+            self.slow.clear()
+
+# Shared tracer used by the app, the Modbus client and the scanner
+tracer = Tracer()
+
+_profile_lock = threading.Lock()
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> str:
+    """
+    Sample the stacks of all other threads of the live process
+
+    Args:
+        seconds (float): How long to sample for
+        interval (float): Seconds between samples
+
+    Returns:
+        str: Folded stacks ("thread;frame;frame count" per line), the input
+            format of flamegraph.pl, speedscope and similar tools
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        me = threading.get_ident()
+        counts = {}
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ';'.join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            time.sleep(interval)
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,397 @@
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class Sink:
+    """Base class for a northbound publishing target
+
+    Records are queued without blocking the caller, sent in batches by a
+    worker thread and spooled to disk while the target is unreachable.
+    Subclasses implement send(batch).
+    """
+
+    def __init__(self, name, batch_size=100, batch_interval=1.0, queue_size=10000,
+                 spool_dir='spool', max_spool_bytes=50 * 1024 * 1024,
+                 retry_interval=1.0, max_retry_interval=60.0):
+        self.name = name
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_spool_bytes = max_spool_bytes
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.spool_file = os.path.join(spool_dir, f"{name}.spool")
+        self.replay_file = self.spool_file + '.replay'
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Updated from the caller's thread (drops) and the worker thread
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'sent': 0,
+            'batches': 0,
+            'errors': 0,
+            'spooled': 0,
+            'dropped': 0,
+            'last_error': None,
+            'last_send': None
+        }
+        self.started = time.time()
+        self._backoff = retry_interval
+        self._retry_at = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"sink-{name}", daemon=True)
+        self._thread.start()
+
+    def send(self, batch: List[Dict]):
+        """Deliver a batch of records; raise on failure"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any connection held by the sink"""
+
+    def submit(self, record: Dict) -> bool:
+        """Queue a record without blocking; drops it when the queue is full"""
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self._count(dropped=1)
+            return False
+
+    def stop(self):
+        """Flush what is queued and stop the worker"""
+        self._stop.set()
+        self._thread.join(timeout=self.batch_interval + 5)
+        self.close()
+
+    def get_metrics(self) -> Dict:
+        """Get throughput and queue metrics for this sink"""
+        elapsed = max(time.time() - self.started, 1e-9)
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        metrics['queue_depth'] = self.queue.qsize()
+        metrics['spool_bytes'] = sum(os.path.getsize(path) for path in (self.spool_file, self.replay_file)
+                                     if os.path.exists(path))
+        metrics['records_per_second'] = round(metrics['sent'] / elapsed, 2)
+        return metrics
+
+    def _count(self, **increments):
+        """Add to counters in the metrics"""
+        with self._metrics_lock:
+            for key, amount in increments.items():
+                self.metrics[key] += amount
+
+    def _collect(self) -> List[Dict]:
+        """Wait for a batch to fill up or for the batch interval to pass"""
+        batch = []
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set() or not self.queue.empty():
+            batch = self._collect()
+            if batch:
+                if self._has_spool():
+                    # Keep order: new records go behind the ones still spooled
+                    self._spool(batch)
+                else:
+                    self._deliver(batch)
+            if time.time() >= self._retry_at:
+                self._replay_spool()
+
+    def _deliver(self, batch: List[Dict]) -> bool:
+        """Send a batch, spooling it if the target is down"""
+        if time.time() < self._retry_at:
+            self._spool(batch)
+            return False
+        try:
+            self.send(batch)
+        except Exception as e:
+            with self._metrics_lock:
+                self.metrics['errors'] += 1
+                self.metrics['last_error'] = str(e)
+            logger.warning(f"Sink {self.name} send failed, retrying in {self._backoff:.0f}s: {e}")
+            self._retry_at = time.time() + self._backoff
+            self._backoff = min(self._backoff * 2, self.max_retry_interval)
+            self._spool(batch)
+            return False
+
+        with self._metrics_lock:
+            self.metrics['sent'] += len(batch)
+            self.metrics['batches'] += 1
+            self.metrics['last_send'] = time.time()
+        self._backoff = self.retry_interval
+        return True
+
+    def _spool(self, batch: List[Dict]):
+        """Append a batch to the on-disk spool"""
+        try:
+            if os.path.exists(self.spool_file) and os.path.getsize(self.spool_file) >= self.max_spool_bytes:
+                self._count(dropped=len(batch))
+                return
+            # Start on a fresh line if a crash cut the last one short
+            torn = False
+            if os.path.exists(self.spool_file) and os.path.getsize(self.spool_file) > 0:
+                with open(self.spool_file, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b'\n'
+            with open(self.spool_file, 'a') as f:
+                if torn:
+                    f.write('\n')
+                for record in batch:
+                    f.write(json.dumps(record) + '\n')
+            self._count(spooled=len(batch))
+        except Exception as e:
+            logger.error(f"Sink {self.name} spool error: {e}")
+            self._count(dropped=len(batch))
+
+    def _has_spool(self) -> bool:
+        """Check for records waiting on disk"""
+        return os.path.exists(self.spool_file) or os.path.exists(self.replay_file)
+
+    def _replay_spool(self):
+        """Send spooled records once the target is reachable again"""
+        try:
+            # A replay file left by an interrupted run holds older records;
+            # replay it first and never overwrite it with the current spool
+            if not os.path.exists(self.replay_file):
+                if not os.path.exists(self.spool_file):
+                    return
+                os.replace(self.spool_file, self.replay_file)
+            records = self._read_spool(self.replay_file)
+            os.remove(self.replay_file)
+        except Exception as e:
+            logger.error(f"Sink {self.name} spool read error: {e}")
+            return
+
+        logger.info(f"Sink {self.name} replaying {len(records)} spooled records")
+        for position in range(0, len(records), self.batch_size):
+            if not self._deliver(records[position:position + self.batch_size]):
+                # _deliver spooled the failed batch; keep the rest for later
+                self._spool(records[position + self.batch_size:])
+                break
+
+    def _read_spool(self, filename) -> List[Dict]:
+        """Read spooled records, skipping lines that cannot be decoded"""
+        records = []
+        skipped = 0
+        with open(filename, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    records.append(record)
+                else:
+                    skipped += 1
+        if skipped:
+            # Typically a line cut short by a crash while spooling
+            logger.warning(f"Sink {self.name} skipped {skipped} unreadable spool lines")
+            self._count(dropped=skipped)
+        return records
+
+class LineProtocolSink(Sink):
+    """Writes records as InfluxDB line protocol to a file or a TCP/UDP socket
+
+    The target is a file path, 'tcp://host:port' or 'udp://host:port'.
+    """
+
+    def __init__(self, target, measurement='modbus', **kwargs):
+        self.target = target
+        self.measurement = measurement
+        self._socket = None
+        super().__init__('line_protocol', **kwargs)
+
+    def format(self, record: Dict) -> str:
+        """Format one record as a line protocol line"""
+        value = record['value']
+        if isinstance(value, bool):
+            field = 'true' if value else 'false'
+        elif isinstance(value, int):
+            field = f"{value}i"
+        else:
+            field = repr(value)
+        timestamp = int(record['timestamp'] * 1e9)
+        tags = f"category={record['category']},address={record['address']}"
+        if record.get('device'):
+            device = record['device'].replace(',', r'\,').replace(' ', r'\ ').replace('=', r'\=')
+            tags += f",device={device}"
+        return f"{self.measurement},{tags} value={field} {timestamp}"
+
+    def send(self, batch: List[Dict]):
+        payload = ''.join(self.format(record) + '\n' for record in batch).encode()
+        if self.target.startswith(('tcp://', 'udp://')):
+            scheme, _, address = self.target.partition('://')
+            host, _, port = address.rpartition(':')
+            if scheme == 'udp':
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                    sock.sendto(payload, (host, int(port)))
+                return
+            try:
+                if self._socket is None:
+                    self._socket = socket.create_connection((host, int(port)), timeout=5)
+                self._socket.sendall(payload)
+            except Exception:
+                self.close()
+                raise
+        else:
+            with open(self.target, 'ab') as f:
+                f.write(payload)
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+
+class WebhookSink(Sink):
+    """POSTs each batch as a JSON array to a URL"""
+
+    def __init__(self, url, timeout=5, **kwargs):
+        self.url = url
+        self.timeout = timeout
+        super().__init__('webhook', **kwargs)
+
+    def send(self, batch: List[Dict]):
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(batch).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise Exception(f"Webhook returned HTTP {response.status}")
+
+class MqttSink(Sink):
+    """Publishes each batch as a JSON array to an MQTT topic
+
+    Requires the optional paho-mqtt 2.x package.
+    """
+
+    def __init__(self, host, port=1883, topic='modbus', qos=1, **kwargs):
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError:
+            raise RuntimeError("MQTT publishing requires paho-mqtt (pip install -r requirements.txt)")
+        if not hasattr(mqtt, 'CallbackAPIVersion'):
+            raise RuntimeError("MQTT publishing requires paho-mqtt 2.x")
+
+        self.topic = topic
+        self.qos = qos
+        self._client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        self._client.connect_async(host, port)
+        self._client.loop_start()
+        super().__init__('mqtt', **kwargs)
+
+    def send(self, batch: List[Dict]):
+        if not self._client.is_connected():
+            raise Exception("MQTT broker not connected")
+        info = self._client.publish(self.topic, json.dumps(batch), qos=self.qos)
+        info.wait_for_publish(timeout=5)
+        if not info.is_published():
+            raise Exception(f"MQTT publish failed with code {info.rc}")
+
+    def close(self):
+        self._client.loop_stop()
+        self._client.disconnect()
+
+class PublishPipeline:
+    """Feeds values read by the client to all configured sinks"""
+
+    def __init__(self, sinks=None, on_change=True):
+        self.sinks = list(sinks or [])
+        self.on_change = on_change
+        self.last_values = {}
+        # publish() runs on the scanner thread and on request threads
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: Sink):
+        """Add a publishing target"""
+        self.sinks.append(sink)
+
+    def publish(self, category: str, values: Dict, device: Optional[str] = None):
+        """
+        Queue read values for publishing; used as a ModbusClient read listener
+
+        Args:
+            category (str): 'inputs', 'coils' or 'registers'
+            values (dict): Address to value mapping
+            device (str): Device the values came from, when there are several
+        """
+        if not self.sinks:
+            return
+
+        now = time.time()
+        with self._lock:
+            last = self.last_values.setdefault((device, category), {})
+            for address, value in values.items():
+                if self.on_change and last.get(address) == value and address in last:
+                    continue
+                last[address] = value
+                record = {'category': category, 'address': address, 'value': value, 'timestamp': now}
+                if device is not None:
+                    record['device'] = device
+                for sink in self.sinks:
+                    sink.submit(record)
+
+    def get_metrics(self) -> Dict:
+        """Get metrics for all sinks"""
+        return {sink.name: sink.get_metrics() for sink in self.sinks}
+
+    def stop(self):
+        """Stop all sinks"""
+        for sink in self.sinks:
+            sink.stop()
+
+def create_pipeline(config, spool_dir: Optional[str] = None) -> PublishPipeline:
+    """
+    Create a pipeline with the sinks enabled in the configuration
+
+    Args:
+        config: Configuration object
+        spool_dir (str): Spool directory, instead of PUBLISH_SPOOL_DIR; every
+            process publishing at the same time needs its own
+    """
+    options = {
+        'batch_size': config.PUBLISH_BATCH_SIZE,
+        'batch_interval': config.PUBLISH_BATCH_INTERVAL,
+        'queue_size': config.PUBLISH_QUEUE_SIZE,
+        'spool_dir': spool_dir or config.PUBLISH_SPOOL_DIR
+    }
+    pipeline = PublishPipeline(on_change=config.PUBLISH_ON_CHANGE)
+    factories = [
+        (config.PUBLISH_MQTT_HOST, lambda: MqttSink(config.PUBLISH_MQTT_HOST, config.PUBLISH_MQTT_PORT,
+                                                    config.PUBLISH_MQTT_TOPIC, **options)),
+        (config.PUBLISH_LINE_TARGET, lambda: LineProtocolSink(config.PUBLISH_LINE_TARGET, **options)),
+        (config.PUBLISH_WEBHOOK_URL, lambda: WebhookSink(config.PUBLISH_WEBHOOK_URL, **options))
+    ]
+    for enabled, factory in factories:
+        if not enabled:
+            continue
+        try:
+            pipeline.add_sink(factory())
+        except Exception as e:
+            logger.error(f"Could not create publishing sink: {e}")
+    return pipeline
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded Modbus traffic log against a local simulated server.
+
+Each recorded response is loaded into the simulator just before the same
+request is sent again through ModbusClient, so the read path is exercised
+with the real captured workload. Use --fast to skip the original timing.
+
+Usage:
+    python replay.py capture.mbtr [--fast] [--port 5020]
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import threading
+import time
+
+import traffic_recorder
+from modbus_client import ModbusClient
+
+def start_simulator(port):
+    """Start a pymodbus TCP server on localhost and return its datastore"""
+    from pymodbus.datastore import ModbusSequentialDataBlock, ModbusSlaveContext, ModbusServerContext
+    from pymodbus.server import StartTcpServer
+
+    store = ModbusSlaveContext(
+        di=ModbusSequentialDataBlock(0, [0] * 65536),
+        co=ModbusSequentialDataBlock(0, [0] * 65536),
+        hr=ModbusSequentialDataBlock(0, [0] * 65536),
+        ir=ModbusSequentialDataBlock(0, [0] * 65536),
+        zero_mode=True
+    )
+    context = ModbusServerContext(slaves=store, single=True)
+    thread = threading.Thread(
+        target=StartTcpServer,
+        kwargs={'context': context, 'address': ('127.0.0.1', port)},
+        daemon=True
+    )
+    thread.start()
+    return store
+
+def stop_simulator():
+    """Stop the simulated server"""
+    from pymodbus.server import ServerStop
+    ServerStop()
+
+def percentile(values, fraction):
+    """Get a percentile from a list of latencies"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def replay(filename, port=5020, fast=False):
+    """
+    Replay a traffic log and report latencies
+
+    Args:
+        filename (str): Traffic log written by TrafficRecorder
+        port (int): Local port for the simulated server
+        fast (bool): Send requests back to back instead of with original timing
+
+    Returns:
+        dict: Replay statistics
+    """
+    transactions = list(traffic_recorder.read_log(filename))
+    if not transactions:
+        raise ValueError(f"{filename} contains no transactions")
+
+    store = start_simulator(port)
+    client = ModbusClient()
+    deadline = time.time() + 10
+    while not client.connect('127.0.0.1', port, transactions[0].unit_id):
+        if time.time() > deadline:
+            raise RuntimeError("Simulated server did not start")
+        time.sleep(0.2)
+
+    requests = {
+        traffic_recorder.READ_COILS: client.read_coils,
+        traffic_recorder.READ_DISCRETE_INPUTS: client.read_discrete_inputs,
+        traffic_recorder.READ_HOLDING_REGISTERS: client.read_holding_registers
+    }
+    original, replayed = [], []
+    mismatches = errors = 0
+    first = transactions[0].timestamp
+    started = time.perf_counter()
+
+    try:
+        for transaction in transactions:
+            if not fast:
+                delay = (transaction.timestamp - first) - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+            if transaction.ok:
+                original.append(transaction.latency)
+
+            request_started = time.perf_counter()
+            try:
+                if transaction.function_code in requests:
+                    if transaction.ok:
+                        store.setValues(transaction.function_code, transaction.address, transaction.values)
+                    request_started = time.perf_counter()
+                    values = requests[transaction.function_code](transaction.address, transaction.count)
+                    if transaction.ok and list(values.values())[:transaction.count] != list(transaction.values):
+                        mismatches += 1
+                elif transaction.function_code == traffic_recorder.WRITE_COIL:
+                    client.write_coil(transaction.address, bool(transaction.values and transaction.values[0]))
+                elif transaction.function_code == traffic_recorder.WRITE_REGISTER:
+                    client.write_register(transaction.address, transaction.values[0] if transaction.values else 0)
+                replayed.append(time.perf_counter() - request_started)
+            except Exception:
+                errors += 1
+        # Stop the clock before tearing down the client and simulator
+        duration = time.perf_counter() - started
+    finally:
+        client.disconnect()
+        stop_simulator()
+
+    return {
+        'transactions': len(transactions),
+        'errors': errors,
+        'mismatches': mismatches,
+        'duration': duration,
+        'recorded_duration': transactions[-1].timestamp - first,
+        'original': original,
+        'replayed': replayed
+    }
+
+def main():
+    """Run the replay tool"""
+    parser = argparse.ArgumentParser(description='Replay a recorded Modbus traffic log')
+    parser.add_argument('log', help='traffic log written by the recorder')
+    parser.add_argument('--fast', action='store_true', help='send requests as fast as possible')
+    parser.add_argument('--port', type=int, default=5020, help='port for the simulated server')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    stats = replay(args.log, args.port, args.fast)
+
+    print("=" * 50)
+    print("Modbus Traffic Replay")
+    print("=" * 50)
+    print(f"Transactions: {stats['transactions']}")
+    print(f"Errors:       {stats['errors']}")
+    print(f"Mismatches:   {stats['mismatches']}")
+    print(f"Duration:     {stats['duration']:.3f}s (recorded {stats['recorded_duration']:.3f}s)")
+    print()
+    for label, latencies in (('Recorded', stats['original']), ('Replayed', stats['replayed'])):
+        if latencies:
+            print(f"{label} latency (ms): mean {statistics.mean(latencies) * 1000:.2f}  "
+                  f"p50 {percentile(latencies, 0.5) * 1000:.2f}  "
+                  f"p95 {percentile(latencies, 0.95) * 1000:.2f}  "
+                  f"p99 {percentile(latencies, 0.99) * 1000:.2f}")
+
+    return 1 if stats['errors'] or stats['mismatches'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Dedicated scan engine that polls Modbus devices in separate processes and
+publishes snapshots through shared memory.
+
+Web workers attach to the snapshots with SnapshotReader and serve reads
+straight from shared memory, so the number of HTTP workers does not
+change the polling load on the devices. Alarms and publishing also run
+here, once per device; web workers see alarm state through AlarmState.
+
+Usage:
+    python scan_engine.py
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+from config import Config
+from profiler import tracer
+
+logger = logging.getLogger(__name__)
+
+# Header: an 8-byte sequence counter followed by timestamp, connected flag,
+# input/coil/register start and count and the id of the writer that created
+# the segment. The counter is read and written through a memoryview cast so
+# each access is a single 8-byte load or store; struct.pack_into zero-fills
+# before writing and could expose a false value.
+SEQ_SIZE = 8
+META = struct.Struct('<dB3xHHHHHH')
+WRITER_ID = struct.Struct('<Q')
+WRITER_ID_OFFSET = SEQ_SIZE + META.size
+HEADER_SIZE = WRITER_ID_OFFSET + WRITER_ID.size
+
+# Writer id left in a segment that has been replaced or closed
+RETIRED = 0
+
+def segment_name(prefix, device_index):
+    """Get the shared memory name for a device"""
+    return f"{prefix}_{device_index}"
+
+def segment_size(input_count, coil_count, register_count):
+    """Get the shared memory size for the given ranges"""
+    return HEADER_SIZE + input_count + coil_count + 2 * register_count
+
+def recording_name(filename, device_index):
+    """Get the traffic log name for one device, e.g. capture.0.mbtr"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{device_index}{ext}"
+
+def retire_segment(shm):
+    """Mark a segment as replaced so attached readers move to the new one"""
+    seq_view = shm.buf[:SEQ_SIZE].cast('Q')
+    try:
+        # A crashed writer may have left the counter odd
+        seq = seq_view[0] | 1
+        seq_view[0] = seq
+        WRITER_ID.pack_into(shm.buf, WRITER_ID_OFFSET, RETIRED)
+        seq_view[0] = seq + 1
+    finally:
+        seq_view.release()
+
+def parse_devices(spec):
+    """
+    Parse a device list like 'host:port:unit,host:port:unit'
+
+    Returns:
+        list: (host, port, unit_id) tuples
+    """
+    devices = []
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        host, port, unit_id = (entry.split(':') + [None, None])[:3]
+        devices.append((host, int(port or Config.DEFAULT_MODBUS_PORT), int(unit_id or Config.DEFAULT_MODBUS_UNIT_ID)))
+    return devices
+
+class SnapshotWriter:
+    """Writes one device's values into a shared memory segment
+
+    Updates use a sequence lock: the counter is odd while a write is in
+    progress, so readers can detect and retry torn reads without locking.
+    """
+
+    def __init__(self, name, ranges):
+        self.ranges = ranges
+        self.input_start, self.input_count, self.coil_start, self.coil_count, \
+            self.register_start, self.register_count = ranges
+        size = segment_size(self.input_count, self.coil_count, self.register_count)
+
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            if stale.size >= HEADER_SIZE:
+                retire_segment(stale)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.seq_view = self.shm.buf[:SEQ_SIZE].cast('Q')
+        self.seq = 0
+        self.seq_view[0] = self.seq
+        self.writer_id = time.time_ns()
+        META.pack_into(self.shm.buf, SEQ_SIZE, 0.0, 0, *ranges)
+        WRITER_ID.pack_into(self.shm.buf, WRITER_ID_OFFSET, self.writer_id)
+
+        self.inputs_offset = HEADER_SIZE
+        self.coils_offset = self.inputs_offset + self.input_count
+        self.registers_offset = self.coils_offset + self.coil_count
+        self.registers_format = struct.Struct(f'<{self.register_count}H')
+
+    def write(self, connected, inputs=None, coils=None, registers=None):
+        """
+        Publish a new snapshot
+
+        Args:
+            connected (bool): Whether the device answered this cycle
+            inputs (dict): Discrete input values by address
+            coils (dict): Coil values by address
+            registers (dict): Holding register values by address
+        """
+        buf = self.shm.buf
+        self.seq += 1
+        self.seq_view[0] = self.seq
+
+        if inputs is not None:
+            buf[self.inputs_offset:self.coils_offset] = bytes(
+                1 if inputs.get(self.input_start + i) else 0 for i in range(self.input_count))
+        if coils is not None:
+            buf[self.coils_offset:self.registers_offset] = bytes(
+                1 if coils.get(self.coil_start + i) else 0 for i in range(self.coil_count))
+        if registers is not None:
+            self.registers_format.pack_into(
+                buf, self.registers_offset,
+                *(registers.get(self.register_start + i, 0) & 0xFFFF for i in range(self.register_count)))
+
+        META.pack_into(buf, SEQ_SIZE, time.time(), 1 if connected else 0, *self.ranges)
+        self.seq += 1
+        self.seq_view[0] = self.seq
+
+    def close(self):
+        """Release and remove the segment"""
+        self.seq_view.release()
+        retire_segment(self.shm)
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class SnapshotReader:
+    """Serves reads from a scan engine snapshot in shared memory
+
+    Provides the same read methods as ModbusClient so the web app can use
+    either one. The reader moves to a new segment when the scan engine
+    restarts: a new writer retires the old segment, and a snapshot older
+    than max_age is re-opened by name in case its writer died.
+    """
+
+    def __init__(self, prefix, device_index=0, max_age=None):
+        self.name = segment_name(prefix, device_index)
+        self.max_age = max_age
+        self.shm = None
+
+    def _attach(self):
+        """Attach to the segment once the scan engine has created it"""
+        if self.shm is not None:
+            return True
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return False
+        # The scan engine owns the segment; don't let this process unlink it on exit
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        self.shm = shm
+        self.seq_view = shm.buf[:SEQ_SIZE].cast('Q')
+        self.writer_id = WRITER_ID.unpack_from(shm.buf, WRITER_ID_OFFSET)[0]
+        return True
+
+    def _read(self, decode):
+        """Run decode against a consistent snapshot, retrying torn reads"""
+        for _ in range(2):
+            if not self._attach():
+                break
+            with tracer.span('snapshot.read'):
+                header, writer_id, result = self._read_consistent(decode)
+            if writer_id == self.writer_id and writer_id != RETIRED:
+                return header, result
+            # The scan engine restarted and replaced the segment
+            self.close()
+        raise Exception("Scan engine snapshot not available")
+
+    def _read_consistent(self, decode):
+        """Read the header, writer id and decoded values under the sequence lock"""
+        buf = self.shm.buf
+        seq_view = self.seq_view
+        for _ in range(1000):
+            seq = seq_view[0]
+            if not seq & 1:
+                header = (seq,) + META.unpack_from(buf, SEQ_SIZE)
+                writer_id = WRITER_ID.unpack_from(buf, WRITER_ID_OFFSET)[0]
+                result = decode(buf, header) if writer_id == self.writer_id else None
+                if seq_view[0] == seq:
+                    return header, writer_id, result
+            # A write is in progress; let the writer finish
+            time.sleep(0)
+        raise Exception("Snapshot is being updated too often to read")
+
+    def get_header(self):
+        """Get (timestamp, connected, ranges) of the current snapshot"""
+        header, _ = self._read(lambda buf, header: None)
+        return header[1], bool(header[2]), header[3:]
+
+    def is_connected(self):
+        """Check if the scan engine is polling the device successfully"""
+        try:
+            timestamp, connected, _ = self.get_header()
+            if self.max_age is not None and time.time() - timestamp > self.max_age:
+                # The writer may have died and been restarted; open the name again
+                self.close()
+                timestamp, connected, _ = self.get_header()
+        except Exception:
+            return False
+        if self.max_age is not None and time.time() - timestamp > self.max_age:
+            return False
+        return connected
+
+    @staticmethod
+    def _decode_bits(buf, offset, start, count):
+        return {start + i: bool(value) for i, value in enumerate(buf[offset:offset + count])}
+
+    def read_discrete_inputs(self, start=None, count=None):
+        """Read discrete inputs from the snapshot"""
+        _, inputs = self._read(lambda buf, header: self._decode_bits(buf, HEADER_SIZE, header[3], header[4]))
+        return self._select(inputs, start, count)
+
+    def read_coils(self, start=None, count=None):
+        """Read coils from the snapshot"""
+        _, coils = self._read(lambda buf, header: self._decode_bits(buf, HEADER_SIZE + header[4], header[5], header[6]))
+        return self._select(coils, start, count)
+
+    def read_holding_registers(self, start=None, count=None):
+        """Read holding registers from the snapshot"""
+        def decode(buf, header):
+            offset = HEADER_SIZE + header[4] + header[6]
+            values = struct.unpack_from(f'<{header[8]}H', buf, offset)
+            return {header[7] + i: value for i, value in enumerate(values)}
+        _, registers = self._read(decode)
+        return self._select(registers, start, count)
+
+    @staticmethod
+    def _select(values, start, count):
+        """Restrict values to a requested range"""
+        if start is None and count is None:
+            return values
+        low = start if start is not None else min(values, default=0)
+        high = low + count if count is not None else float('inf')
+        return {address: value for address, value in values.items() if low <= address < high}
+
+    def close(self):
+        """Detach from the segment"""
+        if self.shm is not None:
+            self.seq_view.release()
+            self.shm.close()
+            self.shm = None
+
+class AlarmState:
+    """Alarm state of one device, shared between its scan worker and the web workers
+
+    The scan worker owns the AlarmEngine and writes its state to a JSON
+    file after every cycle. Web workers serve alarms from that file and
+    leave acknowledge and reload commands as files in a mailbox directory,
+    which the scan worker drains every cycle. Files are replaced
+    atomically, so readers never see a partial write.
+    """
+
+    def __init__(self, state_dir, name):
+        self.directory = os.path.join(state_dir, name)
+        self.state_file = os.path.join(self.directory, 'alarms.json')
+        self.commands_dir = os.path.join(self.directory, 'commands')
+        os.makedirs(self.commands_dir, exist_ok=True)
+        self._written = None
+        self._sent = 0
+
+    def _replace(self, filename, data):
+        """Write data to a temporary file and move it into place"""
+        temporary = os.path.join(self.directory, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temporary, 'w') as f:
+            f.write(data)
+        os.replace(temporary, filename)
+
+    # Web worker side
+
+    def get_alarms(self, active_only=False):
+        """Get alarm states as last written by the scan worker"""
+        try:
+            with open(self.state_file, 'r') as f:
+                alarms = json.load(f)
+        except FileNotFoundError:
+            return []
+        return [alarm for alarm in alarms if not active_only or alarm['active'] or not alarm['acknowledged']]
+
+    def acknowledge(self, condition_id=None):
+        """
+        Ask the scan worker to acknowledge one alarm, or all alarms
+
+        Returns:
+            int: Number of alarms that were unacknowledged in the last state
+        """
+        alarms = self.get_alarms()
+        if condition_id is not None and not any(alarm['id'] == condition_id for alarm in alarms):
+            raise KeyError(f"Unknown alarm '{condition_id}'")
+        self.send_command('acknowledge', id=condition_id)
+        return sum(1 for alarm in alarms
+                   if not alarm['acknowledged'] and condition_id in (None, alarm['id']))
+
+    def request_reload(self):
+        """Ask the scan worker to reload the alarm definitions"""
+        self.send_command('reload')
+
+    def send_command(self, command, **arguments):
+        """Leave a command in the mailbox"""
+        self._sent += 1
+        name = f"{time.time_ns():020d}-{os.getpid()}-{self._sent}.json"
+        self._replace(os.path.join(self.commands_dir, name), json.dumps(dict(arguments, command=command)))
+
+    # Scan worker side
+
+    def clear(self):
+        """Drop state and commands left from a previous run"""
+        for name in os.listdir(self.commands_dir):
+            os.remove(os.path.join(self.commands_dir, name))
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+        self._written = None
+
+    def take_commands(self):
+        """Remove and return the waiting commands, oldest first"""
+        commands = []
+        for name in sorted(os.listdir(self.commands_dir)):
+            path = os.path.join(self.commands_dir, name)
+            try:
+                with open(path, 'r') as f:
+                    commands.append(json.load(f))
+            except Exception as e:
+                logger.error(f"Unreadable alarm command {name}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return commands
+
+    def write(self, alarms):
+        """Publish alarm states for the web workers when they changed"""
+        data = json.dumps(alarms)
+        if data == self._written:
+            return
+        try:
+            self._replace(self.state_file, data)
+            self._written = data
+        except OSError as e:
+            # On Windows a reader can briefly block the replace; retry next cycle
+            logger.debug(f"Alarm state write failed: {e}")
+
+def apply_alarm_commands(engine, state):
+    """Run the commands left by web workers against an alarm engine"""
+    for command in state.take_commands():
+        try:
+            if command.get('command') == 'acknowledge':
+                engine.acknowledge(command.get('id'))
+            elif command.get('command') == 'reload':
+                engine.load_alarms()
+        except Exception as e:
+            logger.error(f"Alarm command {command} failed: {e}")
+
+def run_worker(devices, prefix, ranges, interval, number=0):
+    """
+    Poll a shard of devices and publish their snapshots (process entry point)
+
+    Alarms are evaluated and values published here, next to the values, so
+    they run once per device however many web workers there are.
+
+    Args:
+        devices (list): (device index, host, port, unit_id) tuples
+        prefix (str): Shared memory name prefix
+        ranges (tuple): Input/coil/register start and count
+        interval (float): Seconds between scan cycles
+        number (int): Worker number, keeps this worker's publishing spool apart
+    """
+    from alarm_engine import AlarmEngine
+    from modbus_client import ModbusClient
+    from publisher import create_pipeline
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
+    # Turn terminate() into a normal exit so the segments are removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    input_start, input_count, coil_start, coil_count, register_start, register_count = ranges
+    pipeline = create_pipeline(Config, spool_dir=os.path.join(Config.PUBLISH_SPOOL_DIR, f"scan-worker-{number}"))
+    shard = []
+    for index, host, port, unit_id in devices:
+        name = segment_name(prefix, index)
+        client = ModbusClient()
+        if Config.TRAFFIC_RECORD_FILE:
+            client.start_recording(recording_name(Config.TRAFFIC_RECORD_FILE, index))
+        client.set_read_ranges(input_start, input_count, coil_start, coil_count, register_start, register_count)
+
+        alarms = AlarmEngine(Config.ALARMS_FILE)
+        alarms.load_alarms()
+        client.add_listener(alarms.update)
+        device = f"{host}:{port}:{unit_id}"
+        client.add_listener(lambda category, values, device=device: pipeline.publish(category, values, device))
+        state = AlarmState(Config.SCAN_STATE_DIR, name)
+        state.clear()
+
+        shard.append((client, SnapshotWriter(name, ranges), alarms, state, host, port, unit_id))
+
+    next_cycle = time.monotonic()
+    retry_at = {}
+    try:
+        while True:
+            for client, writer, alarms, state, host, port, unit_id in shard:
+                if not client.is_connected():
+                    if time.monotonic() >= retry_at.get(writer, 0):
+                        if client.connect(host, port, unit_id):
+                            retry_at.pop(writer, None)
+                        else:
+                            retry_at[writer] = time.monotonic() + 5
+                            writer.write(False)
+                if client.is_connected():
+                    try:
+                        writer.write(True, client.read_discrete_inputs(), client.read_coils(),
+                                     client.read_holding_registers())
+                    except Exception as e:
+                        logger.error(f"Scan of {host}:{port} failed: {e}")
+                        client.disconnect()
+                        writer.write(False)
+
+                # Delays and commands are handled even while the device is down
+                alarms.tick()
+                apply_alarm_commands(alarms, state)
+                state.write(alarms.get_alarms())
+
+            next_cycle += interval
+            now = time.monotonic()
+            if next_cycle < now:
+                next_cycle = now
+            time.sleep(next_cycle - now)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        for client, writer, *_ in shard:
+            client.disconnect()
+            client.stop_recording()
+            writer.close()
+
+class ScanEngine:
+    """Runs scan worker processes with devices sharded across them"""
+
+    def __init__(self, devices, prefix, ranges, interval=1.0, processes=None):
+        self.devices = devices
+        self.prefix = prefix
+        self.ranges = ranges
+        self.interval = interval
+        count = processes or min(len(devices), multiprocessing.cpu_count())
+        self.shards = [
+            [(index, *device) for index, device in enumerate(devices) if index % count == shard]
+            for shard in range(max(count, 1))
+        ]
+        self.workers = []
+
+    def start(self):
+        """Start one process per shard"""
+        for number, shard in enumerate(self.shards):
+            if not shard:
+                continue
+            worker = multiprocessing.Process(
+                target=run_worker,
+                args=(shard, self.prefix, self.ranges, self.interval, number),
+                name=f"scan-worker-{number}",
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+        logger.info(f"Scan engine started {len(self.workers)} worker(s) for {len(self.devices)} device(s)")
+
+    def stop(self):
+        """Stop all worker processes"""
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.workers = []
+
+def get_ranges():
+    """Get the read ranges from the configuration"""
+    return (Config.DEFAULT_INPUT_START, Config.DEFAULT_INPUT_COUNT,
+            Config.DEFAULT_COIL_START, Config.DEFAULT_COIL_COUNT,
+            Config.DEFAULT_REGISTER_START, Config.DEFAULT_REGISTER_COUNT)
+
+def main():
+    """Run the scan engine until interrupted"""
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
+    devices = parse_devices(Config.SCAN_DEVICES)
+    if not devices:
+        print("No devices configured, set SCAN_DEVICES or MODBUS_HOST")
+        return 1
+
+    engine = ScanEngine(devices, Config.SNAPSHOT_NAME, get_ranges(), Config.SCAN_INTERVAL, Config.SCAN_PROCESSES)
+    engine.start()
+    print(f"Scanning {len(devices)} device(s) with {len(engine.workers)} process(es), press Ctrl+C to stop")
+    try:
+        while any(worker.is_alive() for worker in engine.workers):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
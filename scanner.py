@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from profiler import tracer
+
+logger = logging.getLogger(__name__)
+
+class Scanner:
+    """Background thread that polls the Modbus client at a fixed interval
+
+    Every successful read is passed to the client's read listeners, so
+    alarm evaluation and publishing keep running without a browser open.
+    """
+
+    def __init__(self, modbus_client, interval=1.0):
+        self.modbus_client = modbus_client
+        self.interval = interval
+        self.cycle_listeners = []
+        self.cycle_count = 0
+        self.last_cycle_time = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_cycle_listener(self, callback):
+        """Register a callback run after every scan cycle as callback(duration)"""
+        self.cycle_listeners.append(callback)
+
+    def start(self):
+        """Start scanning if not already running"""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='modbus-scanner', daemon=True)
+        self._thread.start()
+        logger.info(f"Scanner started with {self.interval}s interval")
+
+    def stop(self):
+        """Stop scanning and wait for the current cycle to finish"""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 5)
+        self._thread = None
+
+    def is_running(self):
+        """Check if the scan thread is alive"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def scan_once(self):
+        """Read all configured ranges once"""
+        for read in (self.modbus_client.read_discrete_inputs,
+                     self.modbus_client.read_coils,
+                     self.modbus_client.read_holding_registers):
+            try:
+                read()
+            except Exception as e:
+                logger.debug(f"Scan read failed: {e}")
+
+    def _run(self):
+        next_cycle = time.monotonic()
+        while not self._stop.is_set():
+            if not self.modbus_client.is_connected():
+                break
+
+            started = time.monotonic()
+            tracer.start_trace('scan')
+            self.scan_once()
+            tracer.end_trace()
+            duration = time.monotonic() - started
+            self.cycle_count += 1
+            self.last_cycle_time = duration
+
+            for callback in self.cycle_listeners:
+                try:
+                    callback(duration)
+                except Exception as e:
+                    logger.error(f"Scan cycle listener error: {e}")
+
+            # Keep a fixed rate; skip missed cycles instead of bursting
+            next_cycle += self.interval
+            now = time.monotonic()
+            if next_cycle < now:
+                next_cycle = now
+            self._stop.wait(next_cycle - now)
+        logger.info("Scanner stopped")
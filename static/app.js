@@ -1,6 +1,7 @@
 class ModbusWebClient {
     constructor() {
         this.connected = false;
+        this.writable = false; // false while reads come from a scan engine snapshot
         this.autoRefreshInterval = null;
         this.inputsRefreshInterval = null;
         this.refreshInterval = 5000; // 5 seconds for coils and registers
@@ -8,11 +9,14 @@ class ModbusWebClient {
         this.lastManualWrite = null; // Track last manual write time
         this.writeDelay = 2000; // 2 seconds delay before allowing auto-refresh
         this.names = { inputs: {}, coils: {}, registers: {} };
+        this.loadedNames = { inputs: new Set(), coils: new Set(), registers: new Set() };
         this.nameEditingMode = { inputs: false, coils: false, registers: false };
+        this.namesPageSize = 500; // Server-side maximum page size
+        this.lookupPageSize = 25;
+        this.lookupOffset = 0;
         
         this.initializeEventListeners();
         this.checkConnectionStatus();
-        this.loadNames();
     }
 
     initializeEventListeners() {
@@ -48,6 +52,16 @@ class ModbusWebClient {
         document.getElementById('import-names-btn').addEventListener('click', () => document.getElementById('import-file-input').click());
         document.getElementById('import-file-input').addEventListener('change', (e) => this.importNames(e));
         
+        // Tag lookup
+        document.getElementById('lookup-btn').addEventListener('click', () => this.searchNames(0));
+        document.getElementById('lookup-query').addEventListener('keyup', (e) => {
+            if (e.key === 'Enter') {
+                this.searchNames(0);
+            }
+        });
+        document.getElementById('lookup-prev-btn').addEventListener('click', () => this.searchNames(this.lookupOffset - this.lookupPageSize));
+        document.getElementById('lookup-next-btn').addEventListener('click', () => this.searchNames(this.lookupOffset + this.lookupPageSize));
+        
         // Shutdown button
         document.getElementById('shutdown-btn').addEventListener('click', () => this.shutdownServer());
         
@@ -84,6 +98,7 @@ class ModbusWebClient {
             
             if (result.status === 'success') {
                 this.connected = true;
+                this.writable = true;
                 this.updateConnectionStatus();
                 this.showToast('Connected successfully!', 'success');
                 this.refreshAll();
@@ -109,6 +124,7 @@ class ModbusWebClient {
             
             if (result.status === 'success') {
                 this.connected = false;
+                this.writable = false;
                 this.updateConnectionStatus();
                 this.showToast('Disconnected successfully!', 'info');
                 this.clearData();
@@ -127,6 +143,7 @@ class ModbusWebClient {
             const result = await response.json();
             
             this.connected = result.connected;
+            this.writable = result.writable;
             this.updateConnectionStatus();
         } catch (error) {
             console.error('Status check failed:', error);
@@ -138,7 +155,12 @@ class ModbusWebClient {
         const connectBtn = document.getElementById('connect-btn');
         const disconnectBtn = document.getElementById('disconnect-btn');
         
-        if (this.connected) {
+        if (this.connected && !this.writable) {
+            statusElement.textContent = 'Connected (read only)';
+            statusElement.className = 'badge bg-warning ms-2';
+            connectBtn.disabled = false;
+            disconnectBtn.disabled = true;
+        } else if (this.connected) {
             statusElement.textContent = 'Connected';
             statusElement.className = 'badge bg-success ms-2';
             connectBtn.disabled = true;
@@ -203,6 +225,7 @@ class ModbusWebClient {
             const result = await response.json();
             
             if (result.status === 'success') {
+                await this.ensureNames('inputs', Object.keys(result.data));
                 this.displayInputs(result.data);
             } else {
                 console.error('Failed to read inputs:', result.message);
@@ -218,6 +241,7 @@ class ModbusWebClient {
             const result = await response.json();
             
             if (result.status === 'success') {
+                await this.ensureNames('coils', Object.keys(result.data));
                 this.displayCoils(result.data);
             } else {
                 console.error('Failed to read coils:', result.message);
@@ -233,6 +257,7 @@ class ModbusWebClient {
             const result = await response.json();
             
             if (result.status === 'success') {
+                await this.ensureNames('registers', Object.keys(result.data));
                 this.displayRegisters(result.data);
             } else {
                 console.error('Failed to read registers:', result.message);
@@ -490,17 +515,129 @@ class ModbusWebClient {
     }
 
     // Names Management Functions
+    async ensureNames(category, addresses) {
+        // Fetch names only for displayed addresses that are not cached yet
+        const missing = addresses.map(Number).filter((address) => !this.loadedNames[category].has(address));
+        if (missing.length === 0) return;
+        
+        const start = Math.min(...missing);
+        const end = Math.max(...missing);
+        
+        try {
+            let offset = 0;
+            let total = 0;
+            do {
+                const params = new URLSearchParams({ category, start, end, offset, limit: this.namesPageSize });
+                const response = await fetch(`/api/query_names?${params}`);
+                const result = await response.json();
+                
+                if (result.status !== 'success') {
+                    console.error('Failed to load names:', result.message);
+                    return;
+                }
+                
+                for (const item of result.data.items) {
+                    this.names[category][item.address] = item.name;
+                }
+                total = result.data.total;
+                offset += result.data.items.length;
+            } while (offset < total);
+            
+            for (const address of missing) {
+                this.loadedNames[category].add(address);
+            }
+        } catch (error) {
+            console.error('Failed to load names:', error);
+        }
+    }
+
+    invalidateNames() {
+        this.names = { inputs: {}, coils: {}, registers: {} };
+        this.loadedNames = { inputs: new Set(), coils: new Set(), registers: new Set() };
+    }
+
     async loadNames() {
         try {
-            const response = await fetch('/api/get_names');
+            const response = await fetch('/api/load_names', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                }
+            });
+
             const result = await response.json();
             
             if (result.status === 'success') {
-                this.names = result.data;
+                this.invalidateNames();
+                this.showToast(result.message, 'success');
+                this.refreshAll(); // Refresh display to show loaded names
+            } else {
+                this.showToast(result.message, 'error');
             }
         } catch (error) {
-            console.error('Failed to load names:', error);
+            this.showToast('Failed to load names: ' + error.message, 'error');
+        }
+    }
+
+    async searchNames(offset) {
+        const category = document.getElementById('lookup-category').value;
+        const mode = document.getElementById('lookup-mode').value;
+        const query = document.getElementById('lookup-query').value.trim();
+        const params = new URLSearchParams({ category, offset: Math.max(offset, 0), limit: this.lookupPageSize });
+        
+        if (mode === 'range') {
+            // Accept "100-199", "100-" or a single address
+            const [start, end] = query.split('-').map((part) => part.trim());
+            if (start) params.set('start', start);
+            if (end === undefined && start) params.set('end', start);
+            if (end) params.set('end', end);
+        } else if (query) {
+            params.set(mode, query);
         }
+        
+        try {
+            const response = await fetch(`/api/query_names?${params}`);
+            const result = await response.json();
+            
+            if (result.status === 'success') {
+                this.lookupOffset = result.data.offset;
+                this.displayLookupResults(result.data);
+            } else {
+                this.showToast(result.message, 'error');
+            }
+        } catch (error) {
+            this.showToast('Lookup failed: ' + error.message, 'error');
+        }
+    }
+
+    displayLookupResults(page) {
+        const container = document.getElementById('lookup-results');
+        container.innerHTML = '';
+        
+        if (page.items.length === 0) {
+            container.innerHTML = '<p class="text-muted">No matching tags</p>';
+        }
+        
+        for (const item of page.items) {
+            const div = document.createElement('div');
+            div.className = 'd-flex justify-content-between border-bottom py-1';
+            
+            const address = document.createElement('span');
+            address.className = 'text-muted';
+            address.textContent = item.address;
+            const name = document.createElement('span');
+            name.textContent = item.name;
+            
+            div.appendChild(address);
+            div.appendChild(name);
+            container.appendChild(div);
+        }
+        
+        const first = page.total === 0 ? 0 : page.offset + 1;
+        const last = page.offset + page.items.length;
+        document.getElementById('lookup-summary').textContent = `${first}-${last} of ${page.total}`;
+        document.getElementById('lookup-prev-btn').disabled = page.offset === 0;
+        document.getElementById('lookup-next-btn').disabled = last >= page.total;
     }
 
     async setName(category, address, name) {
@@ -559,7 +696,7 @@ class ModbusWebClient {
                 const result = await response.json();
                 
                 if (result.status === 'success') {
-                    this.names = result.data;
+                    this.invalidateNames();
                     this.showToast(result.message, 'success');
                     this.refreshAll(); // Refresh display to show new names
                 } else {
@@ -596,7 +733,7 @@ class ModbusWebClient {
             const result = await response.json();
             
             if (result.status === 'success') {
-                this.names = result.data;
+                this.invalidateNames();
                 this.showToast(result.message, 'success');
                 this.refreshAll(); // Refresh display to show new names
             } else {
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental alarm engine.
+
+Values and delays are driven with explicit timestamps through update() and
+tick(), so no test depends on the wall clock.
+
+Run with: python -m unittest test_alarm_engine
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from alarm_engine import AlarmEngine, parse_tag
+
+def make_engine(definitions):
+    """Build an engine compiled from definitions"""
+    engine = AlarmEngine(os.devnull)
+    engine.compile(definitions)
+    return engine
+
+def is_active(engine, condition_id):
+    return engine.conditions[condition_id].active
+
+def pending(engine, condition_id):
+    """Get the target state of a running delay, or None"""
+    condition = engine.conditions[condition_id]
+    return condition.pending[0] if condition.pending else None
+
+class ParseTagTest(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(parse_tag('registers:10'), ('registers', 10))
+        self.assertEqual(parse_tag('coils:0'), ('coils', 0))
+
+    def test_invalid(self):
+        for tag in ('registers', 'holding:1', ':5', 'inputs:'):
+            with self.assertRaises(ValueError):
+                parse_tag(tag)
+
+class ThresholdTest(unittest.TestCase):
+    def test_high_limit_with_deadband(self):
+        engine = make_engine([{'id': 'hot', 'tag': 'registers:1', 'high': 100, 'deadband': 5}])
+
+        engine.update('registers', {1: 99}, now=1)
+        self.assertFalse(is_active(engine, 'hot'))
+        engine.update('registers', {1: 100}, now=2)
+        self.assertTrue(is_active(engine, 'hot'))
+
+        # Inside the deadband the alarm holds; it clears only below high - deadband
+        engine.update('registers', {1: 96}, now=3)
+        self.assertTrue(is_active(engine, 'hot'))
+        engine.update('registers', {1: 95}, now=4)
+        self.assertTrue(is_active(engine, 'hot'))
+        engine.update('registers', {1: 94}, now=5)
+        self.assertFalse(is_active(engine, 'hot'))
+
+        # Without the alarm raised the deadband does not apply
+        engine.update('registers', {1: 97}, now=6)
+        self.assertFalse(is_active(engine, 'hot'))
+
+    def test_low_limit_with_deadband(self):
+        engine = make_engine([{'id': 'cold', 'tag': 'registers:2', 'low': 10, 'deadband': 2}])
+
+        engine.update('registers', {2: 10}, now=1)
+        self.assertTrue(is_active(engine, 'cold'))
+        engine.update('registers', {2: 12}, now=2)
+        self.assertTrue(is_active(engine, 'cold'))
+        engine.update('registers', {2: 13}, now=3)
+        self.assertFalse(is_active(engine, 'cold'))
+
+    def test_raised_alarm_needs_acknowledgement(self):
+        engine = make_engine([{'id': 'hot', 'tag': 'registers:1', 'high': 100}])
+        self.assertTrue(engine.conditions['hot'].acknowledged)
+
+        engine.update('registers', {1: 150}, now=1)
+        self.assertFalse(engine.conditions['hot'].acknowledged)
+        self.assertEqual(engine.acknowledge('hot'), 1)
+        self.assertEqual(engine.acknowledge(), 0)
+        with self.assertRaises(KeyError):
+            engine.acknowledge('missing')
+
+    def test_unreferenced_tags_are_ignored(self):
+        engine = make_engine([{'id': 'hot', 'tag': 'registers:1', 'high': 100}])
+        engine.update('registers', {0: 500, 2: 500}, now=1)
+        engine.update('coils', {1: True}, now=1)
+        self.assertFalse(is_active(engine, 'hot'))
+
+class BitsAndRateTest(unittest.TestCase):
+    def test_bits(self):
+        engine = make_engine([{'id': 'fault', 'type': 'bits', 'tag': 'registers:3', 'mask': 0b0110, 'value': 0b0100}])
+
+        engine.update('registers', {3: 0b1100}, now=1)
+        self.assertTrue(is_active(engine, 'fault'))
+        engine.update('registers', {3: 0b0110}, now=2)
+        self.assertFalse(is_active(engine, 'fault'))
+
+    def test_rate_sees_every_sample(self):
+        engine = make_engine([{'id': 'ramp', 'type': 'rate', 'tag': 'registers:4', 'max_rate': 10, 'deadband': 2}])
+
+        engine.update('registers', {4: 0}, now=0)
+        engine.update('registers', {4: 5}, now=1)
+        self.assertFalse(is_active(engine, 'ramp'))
+        engine.update('registers', {4: 20}, now=2)
+        self.assertTrue(is_active(engine, 'ramp'))
+
+        # Hysteresis on the rate: 9/s stays raised, a repeated value clears it
+        engine.update('registers', {4: 29}, now=3)
+        self.assertTrue(is_active(engine, 'ramp'))
+        engine.update('registers', {4: 29}, now=4)
+        self.assertFalse(is_active(engine, 'ramp'))
+
+class DelayTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = make_engine([
+            {'id': 'hot', 'tag': 'registers:1', 'high': 100, 'on_delay': 5, 'off_delay': 3}
+        ])
+
+    def test_on_delay(self):
+        self.engine.update('registers', {1: 150}, now=10)
+        self.assertFalse(is_active(self.engine, 'hot'))
+        self.assertTrue(pending(self.engine, 'hot'))
+
+        self.engine.tick(now=14.9)
+        self.assertFalse(is_active(self.engine, 'hot'))
+        self.engine.tick(now=15)
+        self.assertTrue(is_active(self.engine, 'hot'))
+        self.assertIsNone(pending(self.engine, 'hot'))
+        self.assertEqual(self.engine.conditions['hot'].changed_at, 15)
+
+    def test_off_delay(self):
+        self.engine.update('registers', {1: 150}, now=0)
+        self.engine.tick(now=5)
+        self.engine.update('registers', {1: 50}, now=10)
+        self.assertTrue(is_active(self.engine, 'hot'))
+        self.assertFalse(pending(self.engine, 'hot'))
+
+        self.engine.tick(now=12.9)
+        self.assertTrue(is_active(self.engine, 'hot'))
+        self.engine.tick(now=13)
+        self.assertFalse(is_active(self.engine, 'hot'))
+
+    def test_update_fires_expired_timers(self):
+        self.engine.update('registers', {1: 150}, now=0)
+        self.engine.update('registers', {2: 0}, now=6)
+        self.assertTrue(is_active(self.engine, 'hot'))
+
+    def test_returning_before_delay_cancels(self):
+        self.engine.update('registers', {1: 150}, now=0)
+        self.engine.update('registers', {1: 50}, now=2)
+        self.assertIsNone(pending(self.engine, 'hot'))
+
+        # The cancelled timer stays in the heap but must not fire
+        self.assertEqual(len(self.engine.timers), 1)
+        self.engine.tick(now=10)
+        self.assertFalse(is_active(self.engine, 'hot'))
+        self.assertEqual(self.engine.timers, [])
+
+    def test_restarted_delay_uses_latest_timer(self):
+        self.engine.update('registers', {1: 150}, now=0)
+        self.engine.update('registers', {1: 50}, now=2)
+        self.engine.update('registers', {1: 150}, now=3)
+
+        # The timer from t=0 is stale; only the one from t=3 counts
+        self.engine.tick(now=5)
+        self.assertFalse(is_active(self.engine, 'hot'))
+        self.engine.tick(now=8)
+        self.assertTrue(is_active(self.engine, 'hot'))
+
+class CombinedTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = make_engine([
+            {'id': 'hot', 'tag': 'registers:1', 'high': 100},
+            {'id': 'running', 'type': 'bits', 'tag': 'coils:0', 'mask': 1},
+            {'id': 'door', 'type': 'bits', 'tag': 'inputs:5', 'mask': 1},
+            {'id': 'hot_running', 'type': 'all', 'conditions': ['hot', 'running']},
+            {'id': 'trip', 'type': 'any', 'conditions': ['hot_running', 'door'], 'on_delay': 2}
+        ])
+
+    def test_all_and_any_propagate(self):
+        self.engine.update('registers', {1: 150}, now=0)
+        self.assertFalse(is_active(self.engine, 'hot_running'))
+
+        self.engine.update('coils', {0: True}, now=1)
+        self.assertTrue(is_active(self.engine, 'hot_running'))
+        self.assertFalse(is_active(self.engine, 'trip'))
+        self.engine.tick(now=3)
+        self.assertTrue(is_active(self.engine, 'trip'))
+
+        self.engine.update('coils', {0: False}, now=4)
+        self.assertFalse(is_active(self.engine, 'hot_running'))
+        self.assertFalse(is_active(self.engine, 'trip'))
+
+        self.engine.update('inputs', {5: True}, now=5)
+        self.engine.tick(now=7)
+        self.assertTrue(is_active(self.engine, 'trip'))
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaises(ValueError):
+            make_engine([
+                {'id': 'a', 'type': 'any', 'conditions': ['b']},
+                {'id': 'b', 'type': 'all', 'conditions': ['a']}
+            ])
+
+    def test_invalid_definitions_are_rejected(self):
+        invalid = [
+            [{'id': 'a', 'type': 'any', 'conditions': ['missing']}],
+            [{'id': 'a', 'tag': 'registers:1', 'high': 1}, {'id': 'a', 'tag': 'registers:2', 'high': 1}],
+            [{'id': 'a', 'tag': 'registers:1'}],
+            [{'id': 'a', 'type': 'rate', 'tag': 'registers:1'}],
+            [{'id': 'a', 'type': 'sometimes', 'tag': 'registers:1'}]
+        ]
+        for definitions in invalid:
+            with self.assertRaises(ValueError):
+                make_engine(definitions)
+
+class ReloadTest(unittest.TestCase):
+    DEFINITIONS = [
+        {'id': 'hot', 'tag': 'registers:1', 'high': 100, 'on_delay': 5},
+        {'id': 'fault', 'type': 'bits', 'tag': 'registers:2', 'mask': 1},
+        {'id': 'slow', 'tag': 'registers:3', 'high': 10, 'on_delay': 20},
+        {'id': 'both', 'type': 'all', 'conditions': ['hot', 'fault']}
+    ]
+
+    def definitions(self):
+        return [dict(definition) for definition in self.DEFINITIONS]
+
+    def setUp(self):
+        self.engine = make_engine(self.definitions())
+        self.engine.update('registers', {1: 150, 2: 1, 3: 50}, now=0)
+        self.engine.tick(now=5)
+        self.engine.acknowledge('hot')
+        self.engine.acknowledge('fault')
+
+    def test_unchanged_conditions_keep_state(self):
+        self.engine.compile(self.definitions())
+
+        for condition_id in ('hot', 'fault', 'both'):
+            self.assertTrue(is_active(self.engine, condition_id))
+        self.assertTrue(self.engine.conditions['hot'].acknowledged)
+        self.assertTrue(self.engine.conditions['fault'].acknowledged)
+        self.assertFalse(self.engine.conditions['both'].acknowledged)
+        self.assertEqual(self.engine.conditions['hot'].changed_at, 5)
+
+    def test_pending_delay_survives_reload(self):
+        self.engine.compile(self.definitions())
+
+        self.assertTrue(pending(self.engine, 'slow'))
+        self.engine.tick(now=19)
+        self.assertFalse(is_active(self.engine, 'slow'))
+        self.engine.tick(now=20)
+        self.assertTrue(is_active(self.engine, 'slow'))
+
+    def test_changed_condition_is_evaluated_again(self):
+        definitions = self.definitions()
+        definitions[1]['mask'] = 2
+        self.engine.compile(definitions)
+
+        # 'fault' no longer matches the last value, and 'both' follows it
+        self.assertFalse(is_active(self.engine, 'fault'))
+        self.assertFalse(is_active(self.engine, 'both'))
+        self.assertTrue(is_active(self.engine, 'hot'))
+
+    def test_removed_condition_disappears(self):
+        self.engine.compile([definition for definition in self.definitions() if definition['id'] == 'fault'])
+        self.assertEqual(list(self.engine.conditions), ['fault'])
+        self.assertTrue(self.engine.conditions['fault'].acknowledged)
+        self.assertEqual(self.engine.timers, [])
+
+class LoadAlarmsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.alarms_file = os.path.join(self.directory, 'alarms.json')
+
+    def test_missing_file_means_no_alarms(self):
+        engine = AlarmEngine(self.alarms_file)
+        self.assertTrue(engine.load_alarms())
+        self.assertEqual(engine.conditions, {})
+
+    def test_invalid_file_keeps_current_alarms(self):
+        with open(self.alarms_file, 'w') as f:
+            json.dump([{'id': 'hot', 'tag': 'registers:1', 'high': 100}], f)
+        engine = AlarmEngine(self.alarms_file)
+        self.assertTrue(engine.load_alarms())
+
+        with open(self.alarms_file, 'w') as f:
+            json.dump([{'id': 'hot', 'tag': 'holding:1', 'high': 100}], f)
+        self.assertFalse(engine.load_alarms())
+        self.assertEqual(list(engine.conditions), ['hot'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,25 @@ Run this script to check if all required packages are installed correctly.
 """
 
 import sys
+import os
+import signal
+import time
+import socket
+import subprocess
 import importlib
+import urllib.request
+
+# Startup budgets in seconds, override to tighten or loosen the regression check
+MAX_IMPORT_TIME = float(os.environ.get('STARTUP_MAX_IMPORT_SECONDS', '3.0'))
+MAX_FIRST_RESPONSE_TIME = float(os.environ.get('STARTUP_MAX_RESPONSE_SECONDS', '10.0'))
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+FROZEN_CANDIDATES = [
+    os.path.join(PROJECT_DIR, 'dist', 'ModbusTCPClient.exe'),
+    os.path.join(PROJECT_DIR, 'dist', 'ModbusTCPClient', 'ModbusTCPClient.exe'),
+    os.path.join(PROJECT_DIR, 'dist', 'ModbusTCPClient', 'ModbusTCPClient'),
+    os.path.join(PROJECT_DIR, 'dist', 'ModbusTCPClient'),
+]
 
 def test_imports():
     """Test if all required packages can be imported"""
@@ -50,6 +68,122 @@ def test_flask_app():
         print(f"✗ Flask app creation failed - {e}")
         return False
 
+def find_free_port():
+    """Get a free local TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def measure_import_time():
+    """Measure how long a fresh interpreter takes to import the app"""
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR,
+                            capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'import failed')
+    return float(result.stdout.strip().splitlines()[-1])
+
+def measure_first_response(command, timeout=60):
+    """
+    Start the server and measure the time until /api/status answers
+    
+    Args:
+        command (list): Command that starts the server
+        timeout (float): Seconds to wait before giving up
+    
+    Returns:
+        float: Seconds from process start to the first successful response
+    """
+    port = find_free_port()
+    # Keep the configured FLASK_DEBUG so a reloader left on is measured too
+    env = dict(os.environ, FLASK_PORT=str(port))
+    url = f"http://127.0.0.1:{port}/api/status"
+    
+    started = time.perf_counter()
+    # Own process group so the whole tree can be stopped afterwards
+    group = ({'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == 'nt'
+             else {'start_new_session': True})
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **group)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"no response within {timeout}s")
+    finally:
+        stop_process_tree(process)
+
+def stop_process_tree(process):
+    """
+    Stop a server and everything it started
+    
+    A one-file build is a bootloader that runs the app in a child process;
+    terminating only the bootloader would leave the app holding the port.
+    """
+    if process.poll() is not None:
+        return
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        if os.name != 'nt':
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        process.kill()
+        process.wait()
+
+def check_budget(label, seconds, budget):
+    """Print a timing and whether it is within budget"""
+    ok = seconds <= budget
+    print(f"{'✓' if ok else '✗'} {label}: {seconds:.2f}s (budget {budget:.1f}s)")
+    return ok
+
+def test_startup_time():
+    """Benchmark import time and time to first response for source and frozen builds"""
+    ok = True
+    try:
+        from config import Config
+        if Config.DEBUG:
+            print("! FLASK_DEBUG=True: the reloader starts the app twice, set it to False for production")
+    except Exception:
+        pass
+    
+    try:
+        ok &= check_budget("Source import time", measure_import_time(), MAX_IMPORT_TIME)
+        ok &= check_budget("Source time to first response",
+                           measure_first_response([sys.executable, 'app.py']), MAX_FIRST_RESPONSE_TIME)
+    except Exception as e:
+        print(f"✗ Source startup benchmark failed - {e}")
+        ok = False
+    
+    frozen = next((path for path in FROZEN_CANDIDATES if os.path.isfile(path)), None)
+    if frozen is None:
+        print("- Frozen build not found in dist/, skipping")
+        return ok
+    
+    try:
+        ok &= check_budget("Frozen time to first response",
+                           measure_first_response([frozen]), MAX_FIRST_RESPONSE_TIME)
+    except Exception as e:
+        print(f"✗ Frozen startup benchmark failed - {e}")
+        ok = False
+    return ok
+
 def main():
     """Run all tests"""
     print("=" * 50)
@@ -71,6 +205,13 @@ def main():
     flask_ok = test_flask_app()
     print()
     
+    # Benchmark startup
+    startup_ok = False
+    if flask_ok:
+        print("Benchmarking startup time...")
+        startup_ok = test_startup_time()
+        print()
+    
     # Summary
     print("=" * 50)
     print("Test Summary:")
@@ -92,7 +233,12 @@ def main():
     else:
         print("✗ Flask application has issues")
     
-    if not failed_imports and modbus_ok and flask_ok:
+    if startup_ok:
+        print("✓ Startup time within budget")
+    else:
+        print("✗ Startup time over budget or not measured")
+    
+    if not failed_imports and modbus_ok and flask_ok and startup_ok:
         print()
         print("🎉 All tests passed! Your installation is ready.")
         print()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Tests for the names search indexes and NamesManager queries.
+
+Run with: python -m unittest test_names_manager
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from names_manager import NameIndex, NamesManager
+
+class NameIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = NameIndex({
+            5: 'Pump_Speed',
+            1: 'pump_run',
+            9: 'Valve_Open',
+            3: 'Tank_Level',
+            7: 'Temp_\U0001F525',
+            8: 'Temp_A',
+            12: 'Pump_Speed'
+        })
+
+    def test_address_range(self):
+        self.assertEqual(self.index.address_range(), [1, 3, 5, 7, 8, 9, 12])
+        self.assertEqual(self.index.address_range(3, 8), [3, 5, 7, 8])
+        self.assertEqual(self.index.address_range(start=9), [9, 12])
+        self.assertEqual(self.index.address_range(end=2), [1])
+        self.assertEqual(self.index.address_range(13, 20), [])
+
+    def test_prefix_is_case_insensitive(self):
+        self.assertEqual(self.index.with_prefix('PUMP'), [1, 5, 12])
+        self.assertEqual(self.index.with_prefix('pump_s'), [5, 12])
+        self.assertEqual(self.index.with_prefix('x'), [])
+        self.assertEqual(self.index.with_prefix(''), [1, 3, 5, 7, 8, 9, 12])
+
+    def test_prefix_includes_non_bmp_names(self):
+        self.assertEqual(self.index.with_prefix('temp_'), [7, 8])
+        self.assertEqual(self.index.with_prefix('Temp_\U0001F525'), [7])
+
+    def test_contains_uses_trigrams(self):
+        self.assertEqual(self.index.containing('speed'), [5, 12])
+        self.assertEqual(self.index.containing('_LEV'), [3])
+        self.assertEqual(self.index.containing('level_x'), [])
+        # Every trigram exists but not in this order
+        self.assertEqual(self.index.containing('pump_open'), [])
+
+    def test_contains_short_queries(self):
+        self.assertEqual(self.index.containing('ve'), [3, 9])
+        self.assertEqual(self.index.containing('a'), [3, 8, 9])
+        self.assertEqual(self.index.containing('\U0001F525'), [7])
+
+    def test_add_replaces_and_remove_drops(self):
+        self.index.add(5, 'Fan_Speed')
+        self.assertEqual(self.index.with_prefix('pump'), [1, 12])
+        self.assertEqual(self.index.with_prefix('fan'), [5])
+        self.assertEqual(self.index.by_name['Pump_Speed'], [12])
+        self.assertEqual(self.index.containing('speed'), [5, 12])
+
+        self.index.add(20, 'Fan_Mode')
+        self.assertEqual(self.index.address_range(10), [12, 20])
+
+        self.index.remove(5)
+        self.assertEqual(self.index.with_prefix('fan'), [20])
+        self.assertIn(5, self.index.addresses)
+        self.index.remove(20, keep_address=False)
+        self.assertEqual(self.index.address_range(10), [12])
+        self.assertNotIn('fan', ''.join(self.index.trigrams))
+
+class NamesManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.names_file = os.path.join(self.directory, 'names.bin')
+        self.manager = NamesManager(self.names_file)
+        self.manager.set_all_names({
+            'inputs': {i: f"Input_{i}" for i in range(250)},
+            'coils': {0: 'Motor_Run', 1: 'Motor_Stop', 2: 'Lamp'},
+            'registers': {'10': 'Flow', '11': 'Flow', '12': 'Pressure'}
+        })
+
+    def write_json(self, names):
+        filename = os.path.join(self.directory, 'import.json')
+        with open(filename, 'w') as f:
+            json.dump(names, f)
+        return filename
+
+    def test_paging_reports_total(self):
+        page = self.manager.query_names('inputs', offset=100, limit=20)
+        self.assertEqual(page['total'], 250)
+        self.assertEqual((page['offset'], page['limit']), (100, 20))
+        self.assertEqual([item['address'] for item in page['items']], list(range(100, 120)))
+
+        page = self.manager.query_names('inputs', offset=240, limit=20)
+        self.assertEqual(len(page['items']), 10)
+
+    def test_range_query(self):
+        page = self.manager.query_names('inputs', start=10, end=14)
+        self.assertEqual(page['total'], 5)
+        self.assertEqual(page['items'][0], {'address': 10, 'name': 'Input_10'})
+
+    def test_filters_combine(self):
+        page = self.manager.query_names('inputs', prefix='input_1', contains='9', start=100)
+        self.assertEqual([item['address'] for item in page['items']],
+                         [109, 119, 129, 139, 149, 159, 169, 179, 189, 190, 191, 192, 193, 194, 195, 196, 197, 198, 199])
+        page = self.manager.query_names('coils', contains='motor', end=0)
+        self.assertEqual(page['items'], [{'address': 0, 'name': 'Motor_Run'}])
+
+    def test_string_keys_are_normalised(self):
+        self.assertEqual(self.manager.get_name('registers', 12), 'Pressure')
+        page = self.manager.query_names('registers', start=11)
+        self.assertEqual([item['address'] for item in page['items']], [11, 12])
+
+    def test_find_address(self):
+        self.assertEqual(self.manager.find_address('Flow'), [
+            {'category': 'registers', 'address': 10},
+            {'category': 'registers', 'address': 11}
+        ])
+        self.assertEqual(self.manager.find_address('Lamp', 'coils'), [{'category': 'coils', 'address': 2}])
+        self.assertEqual(self.manager.find_address('Lamp', 'inputs'), [])
+        self.assertEqual(self.manager.find_address('flow'), [])
+
+    def test_set_and_remove_update_the_index(self):
+        self.manager.set_name('coils', 2, 'Motor_Fault')
+        self.assertEqual(self.manager.query_names('coils', prefix='motor')['total'], 3)
+        self.manager.remove_address('coils', 2)
+        self.assertEqual(self.manager.query_names('coils')['total'], 2)
+        self.assertEqual(self.manager.find_address('Motor_Fault'), [])
+
+    def test_names_survive_reload(self):
+        reloaded = NamesManager(self.names_file, background=True)
+        self.assertEqual(reloaded.find_address('Pressure'), [{'category': 'registers', 'address': 12}])
+        self.assertEqual(reloaded.get_counts(), {'inputs': 250, 'coils': 3, 'registers': 3})
+
+    def test_import(self):
+        filename = self.write_json({'inputs': {'3': 'Door'}, 'coils': {}, 'registers': {}})
+        self.assertTrue(self.manager.import_from_json(filename))
+        self.assertEqual(self.manager.get_all_names()['inputs'], {3: 'Door'})
+        self.assertEqual(self.manager.find_address('Door'), [{'category': 'inputs', 'address': 3}])
+
+    def test_failed_import_keeps_current_names(self):
+        before = self.manager.get_all_names()
+        for names in ({'inputs': {'x': 'Bad'}, 'coils': {}, 'registers': {}},
+                      {'inputs': {}, 'coils': {}}):
+            self.assertFalse(self.manager.import_from_json(self.write_json(names)))
+            self.assertEqual(self.manager.get_all_names(), before)
+            self.assertEqual(self.manager.query_names('coils', prefix='motor')['total'], 2)
+
+        # The next save must write the old names, not the rejected import
+        self.manager.set_name('coils', 3, 'Horn')
+        reloaded = NamesManager(self.names_file)
+        self.assertEqual(reloaded.get_counts(), {'inputs': 250, 'coils': 4, 'registers': 3})
+
+    def test_failed_set_all_names_keeps_current_names(self):
+        before = self.manager.get_all_names()
+        with self.assertRaises(ValueError):
+            self.manager.set_all_names({'inputs': {'x': 'Bad'}})
+        self.assertEqual(self.manager.get_all_names(), before)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Tests for the publishing sinks against local stand-in servers.
+
+Run with: python -m unittest test_publisher
+"""
+
+import json
+import os
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from publisher import LineProtocolSink, PublishPipeline, Sink, WebhookSink
+
+FAST = {'batch_size': 10, 'batch_interval': 0.05, 'retry_interval': 0.1, 'max_retry_interval': 0.2}
+
+def wait_for(predicate, timeout=5.0):
+    """Poll until predicate() is true or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+def make_records(count, start=0):
+    """Build register records with increasing addresses"""
+    return [{'category': 'registers', 'address': start + i, 'value': i, 'timestamp': 1700000000.0}
+            for i in range(count)]
+
+class LineCollector:
+    """Local TCP or UDP listener that keeps the line protocol lines it receives"""
+
+    def __init__(self, udp=False):
+        self.lines = []
+        collector = self
+
+        class TcpHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    collector.lines.append(line.decode().rstrip('\n'))
+
+        class UdpHandler(socketserver.DatagramRequestHandler):
+            def handle(self):
+                collector.lines.extend(self.rfile.read().decode().splitlines())
+
+        server_class = socketserver.ThreadingUDPServer if udp else socketserver.ThreadingTCPServer
+        server_class.daemon_threads = True
+        self.server = server_class(('127.0.0.1', 0), UdpHandler if udp else TcpHandler)
+        self.url = f"{'udp' if udp else 'tcp'}://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class WebhookServer:
+    """Local HTTP server that records POSTed batches and can simulate an outage"""
+
+    def __init__(self):
+        self.batches = []
+        self.failing = False
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if webhook.failing:
+                    self.send_response(503)
+                else:
+                    webhook.batches.append(json.loads(body))
+                    self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def addresses(self):
+        return [record['address'] for batch in self.batches for record in batch]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class FakeMqttClient:
+    """Stand-in for paho.mqtt.client.Client"""
+
+    instances = []
+
+    def __init__(self, callback_api_version=None):
+        self.callback_api_version = callback_api_version
+        self.connected = False
+        self.published = []
+        FakeMqttClient.instances.append(self)
+
+    def connect_async(self, host, port):
+        self.address = (host, port)
+
+    def loop_start(self):
+        self.connected = True
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    def publish(self, topic, payload, qos=0):
+        self.published.append((topic, json.loads(payload), qos))
+        return types.SimpleNamespace(rc=0, wait_for_publish=lambda timeout=None: None,
+                                     is_published=lambda: True)
+
+class SinkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.sinks = []
+
+    def tearDown(self):
+        for sink in self.sinks:
+            sink.stop()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def start(self, sink_class, *args, **kwargs):
+        options = dict(FAST, spool_dir=self.spool_dir)
+        options.update(kwargs)
+        sink = sink_class(*args, **options)
+        self.sinks.append(sink)
+        return sink
+
+class LineProtocolSinkTest(SinkTestCase):
+    def check_delivery(self, udp):
+        collector = LineCollector(udp=udp)
+        self.addCleanup(collector.close)
+        sink = self.start(LineProtocolSink, collector.url)
+        records = make_records(3)
+        records[1]['value'] = True
+        records[2]['value'] = 1.5
+        for record in records:
+            sink.submit(record)
+
+        self.assertTrue(wait_for(lambda: len(collector.lines) == 3))
+        self.assertEqual(collector.lines, [
+            'modbus,category=registers,address=0 value=0i 1700000000000000000',
+            'modbus,category=registers,address=1 value=true 1700000000000000000',
+            'modbus,category=registers,address=2 value=1.5 1700000000000000000'
+        ])
+        self.assertEqual(sink.get_metrics()['sent'], 3)
+
+    def test_tcp(self):
+        self.check_delivery(udp=False)
+
+    def test_udp(self):
+        self.check_delivery(udp=True)
+
+class WebhookSinkTest(SinkTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = WebhookServer()
+        self.addCleanup(self.server.close)
+
+    def test_batches(self):
+        sink = self.start(WebhookSink, self.server.url, batch_size=5, batch_interval=0.5)
+        for record in make_records(12):
+            sink.submit(record)
+
+        self.assertTrue(wait_for(lambda: len(self.server.addresses()) == 12))
+        self.assertEqual(self.server.addresses(), list(range(12)))
+        self.assertTrue(all(len(batch) <= 5 for batch in self.server.batches))
+        self.assertEqual(sink.get_metrics()['errors'], 0)
+
+    def test_outage_spools_and_replays_in_order(self):
+        self.server.failing = True
+        sink = self.start(WebhookSink, self.server.url, batch_interval=2.0, retry_interval=0.2)
+        for record in make_records(20):
+            sink.submit(record)
+        self.assertTrue(wait_for(lambda: sink.get_metrics()['spooled'] == 20))
+        self.assertEqual(sink.get_metrics()['errors'], 1)
+
+        # The target is back and the retry time has passed; a full batch
+        # arriving before the spool is replayed must still go out after it
+        self.server.failing = False
+        time.sleep(0.4)
+        for record in make_records(10, start=20):
+            sink.submit(record)
+
+        self.assertTrue(wait_for(lambda: len(self.server.addresses()) == 30))
+        self.assertEqual(self.server.addresses(), list(range(30)))
+        self.assertTrue(wait_for(lambda: sink.get_metrics()['spool_bytes'] == 0))
+
+    def test_recovers_torn_spool_and_leftover_replay(self):
+        # State left by a crash: an unfinished replay and a spool whose
+        # last line was cut short
+        spool_file = os.path.join(self.spool_dir, 'webhook.spool')
+        with open(spool_file + '.replay', 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in make_records(3))
+        with open(spool_file, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in make_records(5, start=3))
+            f.write('{"category": "registers", "addr')
+
+        sink = self.start(WebhookSink, self.server.url)
+        for record in make_records(2, start=8):
+            sink.submit(record)
+
+        self.assertTrue(wait_for(lambda: len(self.server.addresses()) == 10))
+        self.assertEqual(self.server.addresses(), list(range(10)))
+        self.assertEqual(sink.get_metrics()['dropped'], 1)
+        self.assertTrue(wait_for(lambda: sink.get_metrics()['spool_bytes'] == 0))
+
+class MqttSinkTest(SinkTestCase):
+    def setUp(self):
+        super().setUp()
+        FakeMqttClient.instances = []
+        fake = types.ModuleType('paho.mqtt.client')
+        fake.Client = FakeMqttClient
+        fake.CallbackAPIVersion = types.SimpleNamespace(VERSION2='VERSION2')
+        paho = types.ModuleType('paho')
+        paho.mqtt = types.ModuleType('paho.mqtt')
+        paho.mqtt.client = fake
+        patcher = mock.patch.dict(sys.modules, {'paho': paho, 'paho.mqtt': paho.mqtt, 'paho.mqtt.client': fake})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_publish(self):
+        from publisher import MqttSink
+
+        sink = self.start(MqttSink, 'broker', 1884, 'plant/modbus', batch_size=4)
+        for record in make_records(6):
+            sink.submit(record)
+
+        client = FakeMqttClient.instances[0]
+        self.assertEqual(client.callback_api_version, 'VERSION2')
+        self.assertEqual(client.address, ('broker', 1884))
+        self.assertTrue(wait_for(lambda: sum(len(p[1]) for p in client.published) == 6))
+        self.assertEqual({(topic, qos) for topic, _, qos in client.published}, {('plant/modbus', 1)})
+        self.assertEqual([r['address'] for _, batch, _ in client.published for r in batch], list(range(6)))
+
+    def test_disconnected_broker_spools(self):
+        from publisher import MqttSink
+
+        sink = self.start(MqttSink, 'broker')
+        FakeMqttClient.instances[0].connected = False
+        sink.submit(make_records(1)[0])
+        self.assertTrue(wait_for(lambda: sink.get_metrics()['spooled'] == 1))
+
+class QueueFullTest(SinkTestCase):
+    def test_drops_when_queue_is_full(self):
+        sending = threading.Event()
+        release = threading.Event()
+
+        class BlockingSink(Sink):
+            def send(self, batch):
+                sending.set()
+                release.wait(5)
+
+        sink = self.start(BlockingSink, 'blocking', batch_size=1, queue_size=1)
+        records = make_records(4)
+        self.assertTrue(sink.submit(records[0]))
+        self.assertTrue(sending.wait(5))
+
+        # The worker is stuck in send(); one record fits, the rest are dropped
+        self.assertTrue(sink.submit(records[1]))
+        self.assertFalse(sink.submit(records[2]))
+        self.assertFalse(sink.submit(records[3]))
+        self.assertEqual(sink.get_metrics()['dropped'], 2)
+        release.set()
+        self.assertTrue(wait_for(lambda: sink.get_metrics()['sent'] == 2))
+
+class PublishPipelineTest(unittest.TestCase):
+    def test_on_change_filters_repeats(self):
+        received = []
+        sink = types.SimpleNamespace(submit=received.append)
+        pipeline = PublishPipeline([sink], on_change=True)
+        pipeline.publish('coils', {0: False, 1: True})
+        pipeline.publish('coils', {0: False, 1: False})
+        self.assertEqual([(r['address'], r['value']) for r in received], [(0, False), (1, True), (1, False)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Tests for the scan engine's shared memory snapshots and shared alarm state.
+
+Run with: python -m unittest test_scan_engine
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from multiprocessing import shared_memory
+from unittest import mock
+
+from alarm_engine import AlarmEngine
+from scan_engine import AlarmState, SnapshotReader, SnapshotWriter, apply_alarm_commands, segment_name
+
+RANGES = (0, 4, 0, 4, 100, 4)
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        # A unique prefix per test so runs never see each other's segments
+        self.prefix = f"t{os.getpid()}{uuid.uuid4().hex[:8]}"
+        self.name = segment_name(self.prefix, 0)
+        self.writers = []
+        # Writer and reader share this process, so the resource tracker
+        # would see the reader drop the writer's registration; the tests
+        # remove their segments themselves
+        for function in ('register', 'unregister'):
+            patcher = mock.patch(f'multiprocessing.resource_tracker.{function}')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        for writer in self.writers:
+            writer.close()
+
+    def writer(self):
+        writer = SnapshotWriter(self.name, RANGES)
+        self.writers.append(writer)
+        return writer
+
+    def reader(self, max_age=None):
+        reader = SnapshotReader(self.prefix, 0, max_age)
+        self.addCleanup(reader.close)
+        return reader
+
+    def write_values(self, writer, value):
+        writer.write(True, {i: bool(value & 1) for i in range(4)}, {i: not value & 1 for i in range(4)},
+                     {100 + i: value for i in range(4)})
+
+    def test_write_then_read(self):
+        writer = self.writer()
+        writer.write(True, {0: True, 2: True}, {1: True}, {100: 7, 103: 0x1FFFF})
+        reader = self.reader()
+
+        self.assertTrue(reader.is_connected())
+        timestamp, connected, ranges = reader.get_header()
+        self.assertAlmostEqual(timestamp, time.time(), delta=5)
+        self.assertEqual(ranges, RANGES)
+        self.assertEqual(reader.read_discrete_inputs(), {0: True, 1: False, 2: True, 3: False})
+        self.assertEqual(reader.read_coils(), {0: False, 1: True, 2: False, 3: False})
+        self.assertEqual(reader.read_holding_registers(), {100: 7, 101: 0, 102: 0, 103: 0xFFFF})
+        self.assertEqual(reader.read_holding_registers(101, 2), {101: 0, 102: 0})
+
+        writer.write(False)
+        self.assertFalse(reader.is_connected())
+        # Values from the last good cycle stay readable
+        self.assertEqual(reader.read_holding_registers(100, 1), {100: 7})
+
+    def test_missing_segment(self):
+        reader = self.reader()
+        self.assertFalse(reader.is_connected())
+        with self.assertRaises(Exception):
+            reader.read_coils()
+
+    def test_replaced_writer(self):
+        first = self.writer()
+        self.write_values(first, 1)
+        reader = self.reader()
+        self.assertEqual(reader.read_holding_registers()[100], 1)
+
+        # A restarted scan engine creates the segment again under the same name
+        second = self.writer()
+        self.write_values(second, 2)
+        self.assertEqual(reader.read_holding_registers()[100], 2)
+        self.assertEqual(reader.read_coils()[0], True)
+        self.assertTrue(reader.is_connected())
+
+    def test_closed_writer(self):
+        writer = self.writer()
+        self.write_values(writer, 1)
+        reader = self.reader()
+        self.assertTrue(reader.is_connected())
+
+        self.writers.remove(writer)
+        writer.close()
+        self.assertFalse(reader.is_connected())
+        with self.assertRaises(Exception):
+            reader.read_holding_registers()
+
+        # It picks up the next scan engine without being recreated
+        self.write_values(self.writer(), 3)
+        self.assertEqual(reader.read_holding_registers()[100], 3)
+
+    def test_stale_snapshot_reopens(self):
+        crashed = self.writer()
+        self.write_values(crashed, 1)
+        reader = self.reader(max_age=0.2)
+        self.assertTrue(reader.is_connected())
+
+        # A writer that died never retired its segment; the new one finds
+        # the name free and the reader only notices the snapshot aging
+        shared_memory.SharedMemory(name=self.name).unlink()
+        time.sleep(0.3)
+        self.write_values(self.writer(), 2)
+        self.assertEqual(reader.read_holding_registers()[100], 1)
+        self.assertTrue(reader.is_connected())
+        self.assertEqual(reader.read_holding_registers()[100], 2)
+
+    def test_reads_are_never_torn(self):
+        writer = self.writer()
+        self.write_values(writer, 0)
+        reader = self.reader()
+        stop = threading.Event()
+
+        def write_forever():
+            value = 0
+            while not stop.is_set():
+                value = (value + 1) & 0xFFFF
+                self.write_values(writer, value)
+
+        thread = threading.Thread(target=write_forever)
+        thread.start()
+        try:
+            for _ in range(2000):
+                # Each read is one snapshot, so all its values come from one write
+                inputs = reader.read_discrete_inputs()
+                registers = reader.read_holding_registers()
+                self.assertEqual(len(set(inputs.values())), 1)
+                self.assertEqual(len(set(registers.values())), 1)
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_write_in_progress_is_not_read(self):
+        writer = self.writer()
+        self.write_values(writer, 1)
+        reader = self.reader()
+        writer.seq_view[0] = writer.seq + 1
+        with self.assertRaises(Exception):
+            reader.read_coils()
+        writer.seq_view[0] = writer.seq
+        self.assertEqual(reader.read_holding_registers()[100], 1)
+
+class AlarmStateTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        alarms_file = os.path.join(self.directory, 'alarms.json')
+        with open(alarms_file, 'w') as f:
+            json.dump([{'id': 'high', 'tag': 'registers:1', 'type': 'threshold', 'high': 50}], f)
+        self.engine = AlarmEngine(alarms_file)
+        self.engine.load_alarms()
+        self.worker = AlarmState(self.directory, 'device_0')
+        self.worker.clear()
+        self.web = AlarmState(self.directory, 'device_0')
+
+    def cycle(self):
+        apply_alarm_commands(self.engine, self.worker)
+        self.worker.write(self.engine.get_alarms())
+
+    def test_web_workers_see_scan_state(self):
+        self.assertEqual(self.web.get_alarms(), [])
+        self.cycle()
+        self.assertEqual(self.web.get_alarms(active_only=True), [])
+
+        self.engine.update('registers', {1: 60})
+        self.cycle()
+        self.assertEqual([alarm['id'] for alarm in self.web.get_alarms(active_only=True)], ['high'])
+
+    def test_acknowledge_reaches_the_engine(self):
+        self.engine.update('registers', {1: 60})
+        self.cycle()
+        self.assertEqual(self.web.acknowledge('high'), 1)
+        with self.assertRaises(KeyError):
+            self.web.acknowledge('missing')
+        self.assertFalse(self.engine.get_alarms()[0]['acknowledged'])
+
+        self.cycle()
+        self.assertTrue(self.engine.get_alarms()[0]['acknowledged'])
+        self.assertTrue(self.web.get_alarms()[0]['acknowledged'])
+        self.assertEqual(os.listdir(self.worker.commands_dir), [])
+
+    def test_reload_and_clear(self):
+        self.cycle()
+        with open(self.engine.alarms_file, 'w') as f:
+            json.dump([], f)
+        self.web.request_reload()
+        self.web.acknowledge()
+        self.cycle()
+        self.assertEqual(self.web.get_alarms(), [])
+
+        self.web.request_reload()
+        self.worker.clear()
+        self.assertEqual(self.worker.take_commands(), [])
+        self.assertFalse(os.path.exists(self.worker.state_file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import struct
+import threading
+from collections import namedtuple
+
+MAGIC = b'MBTR'
+VERSION = 1
+
+# Function codes used by ModbusClient
+READ_COILS = 1
+READ_DISCRETE_INPUTS = 2
+READ_HOLDING_REGISTERS = 3
+WRITE_COIL = 5
+WRITE_REGISTER = 6
+
+# timestamp, function code, unit id, address, count, latency, ok flag, payload length
+RECORD = struct.Struct('<dBBHHfBH')
+
+Transaction = namedtuple('Transaction', 'timestamp function_code unit_id address count latency ok values')
+
+def encode_values(function_code, values):
+    """Pack response (or written) values into a compact payload"""
+    if not values:
+        return b''
+    if function_code in (READ_COILS, READ_DISCRETE_INPUTS, WRITE_COIL):
+        packed = bytearray((len(values) + 7) // 8)
+        for i, value in enumerate(values):
+            if value:
+                packed[i // 8] |= 1 << (i % 8)
+        return bytes(packed)
+    return struct.pack(f'<{len(values)}H', *values)
+
+def decode_values(function_code, count, payload):
+    """Unpack a payload written by encode_values"""
+    if not payload:
+        return []
+    if function_code in (READ_COILS, READ_DISCRETE_INPUTS, WRITE_COIL):
+        return [bool(payload[i // 8] >> (i % 8) & 1) for i in range(count)]
+    return list(struct.unpack(f'<{len(payload) // 2}H', payload))
+
+class TrafficRecorder:
+    """Appends every Modbus transaction to a compact binary log
+
+    Each record is a fixed 21 byte header followed by the values, packed
+    as bits for coils/inputs and as 16-bit words for registers.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.count = 0
+        self._lock = threading.Lock()
+        is_new = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self._file = open(filename, 'ab')
+        if is_new:
+            self._file.write(MAGIC + bytes([VERSION]))
+
+    def record(self, timestamp, function_code, unit_id, address, count, latency, ok, values=None):
+        """
+        Append one transaction to the log
+
+        Args:
+            timestamp (float): Time the request was sent
+            function_code (int): Modbus function code
+            unit_id (int): Unit ID of the request
+            address (int): Starting address
+            count (int): Number of coils/inputs/registers (1 for writes)
+            latency (float): Round trip time in seconds
+            ok (bool): False if the request failed
+            values (list): Values returned, or the value written
+        """
+        payload = encode_values(function_code, values) if ok else b''
+        header = RECORD.pack(timestamp, function_code, unit_id or 0, address, count, latency, 1 if ok else 0, len(payload))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(header + payload)
+            self.count += 1
+
+    def close(self):
+        """Flush and close the log"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def read_log(filename):
+    """
+    Read transactions from a traffic log
+
+    Args:
+        filename (str): Path of a log written by TrafficRecorder
+
+    Yields:
+        Transaction: One entry per recorded request
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(len(MAGIC) + 1)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{filename} is not a traffic log")
+        if header[len(MAGIC)] != VERSION:
+            raise ValueError(f"Unsupported traffic log version {header[len(MAGIC)]}")
+
+        while True:
+            raw = f.read(RECORD.size)
+            if len(raw) < RECORD.size:
+                break
+            timestamp, function_code, unit_id, address, count, latency, ok, length = RECORD.unpack(raw)
+            payload = f.read(length)
+            if len(payload) < length:
+                break
+            yield Transaction(timestamp, function_code, unit_id, address, count, latency, bool(ok),
+                              decode_values(function_code, count, payload))